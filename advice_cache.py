@@ -0,0 +1,79 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+ADVICE_CACHE_FILE = "advice_cache.json"
+ADVICE_CACHE_TTL = 6 * 3600  # seconds; 0 disables the cache
+PRICE_BUCKET_PCT = 2.0       # prices within the same ~2% band share cached advice
+
+
+def articles_hash(articles):
+    """Fingerprint of the article texts the advice is based on."""
+    digest = hashlib.sha256()
+    for article in articles:
+        digest.update(hashlib.sha256(article.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def price_bucket(price, pct=PRICE_BUCKET_PCT):
+    """Index of the logarithmic price band of width `pct` percent that `price` falls in."""
+    if not price or price <= 0:
+        return 0
+    return math.floor(math.log(price) / math.log1p(pct / 100))
+
+
+def advice_key(ticker, articles_digest, quantity, price):
+    return f"{ticker}:{articles_digest[:16]}:{quantity}:{price_bucket(price)}"
+
+
+class AdviceCache:
+    """
+    Advice results on disk, keyed by ticker, news fingerprint, position size and
+    price band (see advice_key), so repeated requests skip the model call until
+    the news, the position or the price moves, or the entry is older than `ttl`.
+    """
+
+    def __init__(self, file_path=ADVICE_CACHE_FILE, ttl=ADVICE_CACHE_TTL):
+        self.file_path = file_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = None  # key -> {"advice", "created"}, loaded on first use
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.file_path, "r") as f:
+                    self._entries = json.load(f)
+            except (IOError, json.JSONDecodeError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.file_path)
+
+    def get(self, key):
+        """The cached advice for `key`, or None if there is none or it expired."""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or time.time() - entry["created"] > self.ttl:
+            return None
+        return entry["advice"]
+
+    def put(self, key, advice):
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            for stale in [k for k, entry in entries.items() if now - entry["created"] > self.ttl]:
+                del entries[stale]
+            entries[key] = {"advice": advice, "created": now}
+            self._save()
@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Job states, in order; "failed" can replace any of the later ones
+QUEUED = "queued"
+FETCHING_NEWS = "fetching_news"
+ADVISING = "advising"
+DONE = "done"
+FAILED = "failed"
+
+
+class AdviceJob:
+    def __init__(self, ticker):
+        self.id = uuid.uuid4().hex
+        self.ticker = ticker
+        self.status = QUEUED
+        self.result = None       # dict returned by the runner once DONE
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.listeners = set()   # Socket.IO sids to push progress to; guarded by the AdviceJobs lock
+
+    @property
+    def in_flight(self):
+        return self.status not in (DONE, FAILED)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "ticker": self.ticker,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class AdviceJobs:
+    """
+    Runs advice requests in the background on a bounded worker pool.
+
+    `run(ticker, progress)` does the actual work, calling progress(status) as it
+    moves along, and returns the result dict. `notify(job, listeners)` is called
+    after every status change, with a snapshot of the job's listeners. A request
+    for a ticker that already has a job in flight joins that job instead of
+    starting another one.
+    """
+
+    def __init__(self, run, notify=None, max_workers=2, max_pending=20, keep_seconds=3600):
+        self.run = run
+        self.notify = notify
+        self.max_pending = max_pending
+        self.keep_seconds = keep_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="advice")
+        self._lock = threading.Lock()
+        self._jobs = {}       # job id -> AdviceJob
+        self._in_flight = {}  # ticker -> AdviceJob
+
+    def submit(self, ticker, listener=None):
+        """
+        Starts (or joins) the advice job for `ticker`. Returns the job, or None if
+        too many jobs are already waiting.
+        """
+        with self._lock:
+            self._prune()
+            job = self._in_flight.get(ticker)
+            if job is None:
+                if len(self._in_flight) >= self.max_pending:
+                    return None
+                job = AdviceJob(ticker)
+                self._jobs[job.id] = job
+                self._in_flight[ticker] = job
+                if listener:
+                    job.listeners.add(listener)
+                self._pool.submit(self._run_job, job)
+            elif listener:
+                job.listeners.add(listener)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def listeners(self, job):
+        """Snapshot of the clients to push the job's progress to (safe to iterate while others join)."""
+        with self._lock:
+            return list(job.listeners)
+
+    def forget_listener(self, listener):
+        """Stops pushing progress to a client (e.g. on disconnect)."""
+        with self._lock:
+            for job in self._in_flight.values():
+                job.listeners.discard(listener)
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _set_status(self, job, status):
+        job.status = status
+        if self.notify is not None:
+            try:
+                self.notify(job, self.listeners(job))
+            except Exception as e:
+                print(f"Advice progress for {job.ticker} not delivered: {e}")
+
+    def _run_job(self, job):
+        try:
+            result = self.run(job.ticker, lambda status: self._set_status(job, status))
+            job.result = result
+            status = DONE
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            print(f"Advice for {job.ticker} failed: {e}")
+            status = FAILED
+        with self._lock:
+            job.finished = time.time()
+            if self._in_flight.get(job.ticker) is job:
+                del self._in_flight[job.ticker]
+        self._set_status(job, status)
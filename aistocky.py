@@ -5,37 +5,89 @@ import subprocess
 import json
 from datetime import datetime
 from stocky import load_portfolio, buy_stock, sell_stock
-from google import genai
-from retreivenews import fetch_news
-from stockprice import get_stock_price
+from functools import lru_cache
+import retreivenews
+from retreivenews import article_index
+from article_index import ticker_query, estimate_tokens
+from stockprice import YahooQuotes, StubQuotes
 from datetime import datetime
+import re
+from advice_cache import AdviceCache, advice_key, articles_hash
+from llm_backend import LLM, ADVICES, StubBackend, backend_from_env
 
 
-# --- Gemini Setup ---
-client = genai.Client()  # Requires GEMINI_API_KEY set
+# --- Model Setup ---
+# Gemini and live Yahoo quotes by default (client created on first use).
+# ADVISOR_BACKEND=stub pairs the stub model with made-up quotes and the news
+# already stored, so the whole advice path runs offline.
+llm = LLM(backend_from_env())
+OFFLINE = isinstance(llm.backend, StubBackend)
+quotes = StubQuotes() if OFFLINE else YahooQuotes()
 
 # --- Config ---
 ARTICLES_DIR = "articles"
 
+TOP_ARTICLES = 5
+ARTICLE_TOKEN_BUDGET = 4000
+# Whole-portfolio advice: the first few of the same articles per ticker, one overall budget shared by the tickers
+PORTFOLIO_TOP_ARTICLES = 3
+PORTFOLIO_TOKEN_BUDGET = 16000
 
+advice_cache = AdviceCache()
+
+
+@lru_cache(maxsize=256)
+def company_name(ticker: str) -> str:
+    """Company name for a ticker (empty if it isn't known)."""
+    return quotes.company_name(ticker)
+
+
+def fetch_news(ticker: str):
+    """Fetches the ticker's latest news into the article store (offline: none). Returns the new article ids."""
+    if OFFLINE:
+        return []
+    return retreivenews.fetch_news(ticker)
+
+
+def select_news(ticker: str):
+    """The news articles most relevant to the ticker, within the single-ticker budget."""
+    return article_index.select(ticker_query(ticker, company_name(ticker)), k=TOP_ARTICLES, token_budget=ARTICLE_TOKEN_BUDGET)
+
+
+def fit_budget(texts, token_budget):
+    """The leading texts that fit in `token_budget` tokens (the first one truncated if it is too long on its own)."""
+    fitted = []
+    for text in texts:
+        cost = estimate_tokens(text)
+        if cost > token_budget:
+            if not fitted:
+                fitted.append(text[:token_budget * 4])
+            break
+        fitted.append(text)
+        token_budget -= cost
+    return fitted
 
 
 def summarize_and_advise(ticker: str):
-    """Reads news articles and gets a Buy/Hold/Sell advice from Gemini."""
-    articles = []
-    for filename in os.listdir(ARTICLES_DIR):
-        if filename.endswith(".txt"):
-            with open(os.path.join(ARTICLES_DIR, filename), 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content:
-                    articles.append(content)
-
-    if not articles:
+    """Picks the news articles most relevant to the ticker and gets a Buy/Hold/Sell advice from the model."""
+    selected = select_news(ticker)
+    if not selected:
         print("No articles found for analysis.")
         return "hold"
 
-    combined_news = "\n\n".join(articles[:5])  # Limit to first 5 for token efficiency
+    combined_news = "\n\n".join(selected)
     portfolio = load_portfolio()
+    owned = sum(item["quantity"] for item in portfolio if item["ticker"] == ticker)
+    avg_price = sum(item["price"] * item["quantity"] for item in portfolio if item["ticker"] == ticker) / owned if owned else 0.0
+    current_price = quotes.price(ticker)
+
+    # Same news, position and (roughly) price as a recent call: reuse its advice
+    key = advice_key(ticker, articles_hash(selected), owned, current_price)
+    cached = advice_cache.get(key)
+    if cached is not None:
+        print(f"Using cached advice for {ticker}: {cached}")
+        return cached
+
     prompt = f"""
     You are an AI stock advisor.
     Analyze the following recent news about {ticker} and provide one of three advices:
@@ -44,31 +96,119 @@ def summarize_and_advise(ticker: str):
     3. "sell" - if the stock is likely to fall
 
     Only output one word: buy, hold, or sell.
-    You currently own {sum(item["quantity"] for item in portfolio if item["ticker"] == ticker)} of {ticker} with an average buy price of {(sum(item["price"] * item["quantity"] for item in portfolio if item["ticker"] == ticker))/sum(item["quantity"] for item in portfolio if item["ticker"] == ticker)}. The current price is {get_stock_price(ticker, datetime.now())}
+    You currently own {owned} of {ticker} with an average buy price of {avg_price}. The current price is {current_price}
     News:
     {combined_news}
     """
     print(
-        f"You currently own {sum(item['quantity'] for item in portfolio if item['ticker'] == ticker)} of {ticker} "
+        f"You currently own {owned} of {ticker} "
         f"with an average buy price of "
-        f"{(sum(item['price'] * item['quantity'] for item in portfolio if item['ticker'] == ticker)) / sum(item['quantity'] for item in portfolio if item['ticker'] == ticker):.2f}. "
-        f"The current price is {get_stock_price(ticker, datetime.now())}"
+        f"{avg_price:.2f}. "
+        f"The current price is {current_price}"
     )
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
-    )
-    advice = response.text.strip().lower()
-    if advice not in ["buy", "hold", "sell"]:
-        advice = "hold"
+    advice = llm.generate(prompt).strip().lower()
+    if advice not in ADVICES:
+        return "hold"  # Not cached: the next call asks again
+    advice_cache.put(key, advice)
+    return advice
+
+
+def parse_portfolio_advice(text: str, tickers) -> dict:
+    """
+    Reads {ticker: advice} from the model's answer: a JSON object (possibly in a
+    code fence), or failing that "TICKER: advice" lines. Tickers without a valid
+    advice are left out.
+    """
+    try:
+        answer = json.loads(text[text.index("{"):text.rindex("}") + 1])
+        answer = {str(ticker).upper(): str(advice).strip().lower() for ticker, advice in answer.items()}
+    except (ValueError, AttributeError):
+        answer = {
+            match.group(1).upper(): match.group(2).lower()
+            for match in re.finditer(r"\b([A-Za-z0-9.\-]{1,10})\W{1,5}(buy|hold|sell)\b", text, re.IGNORECASE)
+        }
+    return {ticker: answer[ticker] for ticker in tickers if answer.get(ticker) in ADVICES}
+
+
+def advise_portfolio(tickers=None) -> dict:
+    """
+    Buy/Hold/Sell advice for every holding (or the given tickers) from a single
+    model call: one prompt with each position and its top-ranked articles,
+    answered as a JSON object. Tickers with cached advice for the same news are
+    left out of the prompt. Returns {ticker: advice}.
+    """
+    portfolio = load_portfolio()
+    if tickers is None:
+        tickers = sorted({item["ticker"] for item in portfolio})
+    if not tickers:
+        return {}
+    prices = quotes.latest_prices(tickers)
+    budget = max(500, PORTFOLIO_TOKEN_BUDGET // len(tickers))
+
+    advice, keys, sections = {}, {}, []
+    for ticker in tickers:
+        selected = select_news(ticker)
+        if not selected:
+            print(f"No articles found for {ticker}.")
+            advice[ticker] = "hold"
+            continue
+        owned = sum(item["quantity"] for item in portfolio if item["ticker"] == ticker)
+        avg_price = sum(item["price"] * item["quantity"] for item in portfolio if item["ticker"] == ticker) / owned if owned else 0.0
+        current_price = prices.get(ticker)
+
+        # Keyed on the articles actually sent, so a single-ticker advice is only
+        # reused when it was based on the same news (e.g. all of it fits here too)
+        sent = fit_budget(selected[:PORTFOLIO_TOP_ARTICLES], budget)
+        keys[ticker] = advice_key(ticker, articles_hash(sent), owned, current_price)
+        cached = advice_cache.get(keys[ticker])
+        if cached is not None:
+            print(f"Using cached advice for {ticker}: {cached}")
+            advice[ticker] = cached
+            continue
+
+        news = "\n\n".join(sent)
+        sections.append(
+            f"=== {ticker} ===\n"
+            f"You currently own {owned} of {ticker} with an average buy price of {avg_price:.2f}. "
+            f"The current price is {current_price if current_price is not None else 'unknown'}.\n"
+            f"News:\n{news}"
+        )
+
+    if not sections:
+        return advice
+
+    asked = [ticker for ticker in tickers if ticker not in advice]
+    prompt = f"""
+    You are an AI stock advisor.
+    For each stock below, analyze its recent news and position and provide one of three advices:
+    1. "buy" - if the stock is likely to rise soon
+    2. "hold" - if the stock should be kept as is
+    3. "sell" - if the stock is likely to fall
+
+    Only output a JSON object mapping every ticker to one word, e.g. {{"{asked[0]}": "hold"}}.
+    Tickers: {", ".join(asked)}
+
+    {chr(10).join(sections)}
+    """
+    answered = parse_portfolio_advice(llm.generate(prompt), asked)
+    for ticker in asked:
+        if ticker in answered:
+            advice_cache.put(keys[ticker], answered[ticker])
+        advice[ticker] = answered.get(ticker, "hold")  # Unanswered: not cached, the next call asks again
     return advice
 
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: aistock.py TICKER")
+        print("Usage: aistock.py TICKER | --portfolio")
         sys.exit(1)
 
+    if sys.argv[1] == "--portfolio":
+        for ticker, advice in advise_portfolio().items():
+            print(f"{ticker}: {advice.upper()}")
+        return
+
     ticker = sys.argv[1].upper()
 
     # Step 1: Fetch news
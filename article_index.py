@@ -0,0 +1,170 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+INDEX_FILE = "article_index.json"
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or s that the this to was were will with".split()
+)
+# Words in company names that say nothing about the company
+NAME_NOISE = frozenset("inc incorporated corp corporation co company ltd limited plc holdings group class".split())
+TITLE_WEIGHT = 3  # a title word counts as this many body words
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class ArticleIndex:
+    """
+    BM25 inverted index over the articles in an ArticleStore.
+
+    Only term counts are kept (persisted in `index_file`); refresh() reads just
+    the articles stored since the last refresh, and select() loads only the
+    bodies it returns.
+    """
+
+    def __init__(self, store, index_file=INDEX_FILE):
+        self.store = store
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        self._docs = {}      # article id (as a string) -> {"length", "terms": {term: weighted count}}
+        self._postings = {}  # term -> {article id: weighted count}
+        self._total_length = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, "r") as f:
+                docs = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            docs = {}
+        for doc_id, doc in docs.items():
+            self._insert(doc_id, doc)
+
+    def _save(self):
+        tmp_path = self.index_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._docs, f)
+        os.replace(tmp_path, self.index_file)
+
+    def _insert(self, doc_id, doc):
+        self._docs[doc_id] = doc
+        self._total_length += doc["length"]
+        for term, count in doc["terms"].items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc["length"]
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _index_article(self, article):
+        terms = Counter(tokenize(article["body"]))
+        for token in tokenize(article["title"]):
+            terms[token] += TITLE_WEIGHT
+        doc_id = str(article["id"])
+        self._remove(doc_id)
+        self._insert(doc_id, {"length": sum(terms.values()), "terms": dict(terms)})
+
+    def refresh(self):
+        """Brings the index in line with the store. Returns the number of articles indexed or dropped."""
+        current = {str(article_id) for article_id in self.store.ids()}
+        with self._lock:
+            removed = [doc_id for doc_id in self._docs if doc_id not in current]
+            for doc_id in removed:
+                self._remove(doc_id)
+            new_ids = [int(doc_id) for doc_id in current if doc_id not in self._docs]
+        added = self.add(new_ids) if new_ids else 0
+        if removed and not added:
+            with self._lock:
+                self._save()
+        return len(removed) + added
+
+    def add(self, article_ids):
+        """Indexes newly stored articles (as returned by fetch_news). Returns how many were indexed."""
+        articles = self.store.get(article_ids)
+        with self._lock:
+            for article in articles.values():
+                self._index_article(article)
+            if articles:
+                self._save()
+        return len(articles)
+
+    def search(self, query, k=None):
+        """[(article id, BM25 score)] for the articles matching the query, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avg_length = self._total_length / n or 1
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term, {})
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, count in postings.items():
+                    length_norm = 1 - B + B * self._docs[doc_id]["length"] / avg_length
+                    scores[int(doc_id)] += idf * count * (K1 + 1) / (count + K1 * length_norm)
+        return scores.most_common(k)
+
+    def select(self, query, k=5, token_budget=4000):
+        """
+        Texts of the (at most k) most relevant articles that fit in `token_budget`
+        tokens together; the best article is truncated to the budget if it is too
+        long on its own.
+        """
+        self.refresh()
+        ranked = [article_id for article_id, _ in self.search(query)]
+        selected = []
+        remaining = token_budget
+        # Bodies are loaded in small batches, best first, until k are picked or the budget is used up
+        for start in range(0, len(ranked), k):
+            batch = ranked[start:start + k]
+            articles = self.store.get(batch)
+            for article_id in batch:
+                if len(selected) >= k or remaining <= 0:
+                    return selected
+                article = articles.get(article_id)
+                if article is None:
+                    continue  # Pruned since the last refresh
+                text = article["body"].strip()
+                if not text:
+                    continue
+                cost = estimate_tokens(text)
+                if cost > remaining:
+                    if selected:
+                        continue  # A shorter, less relevant article may still fit
+                    text = text[:remaining * 4]
+                    cost = remaining
+                selected.append(text)
+                remaining -= cost
+        return selected
+
+
+def ticker_query(ticker, company_name=None):
+    """Search query for a ticker's news: the symbol plus the distinctive words of the company name."""
+    words = [ticker]
+    if company_name:
+        words += [word for word in tokenize(company_name) if word not in NAME_NOISE]
+    return " ".join(words)
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+ARTICLE_DB = "articles.db"
+RETENTION_DAYS = 90
+TICKER_IN_TITLE = re.compile(r"\(([A-Z][A-Z0-9.\-]{0,9})\)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    ticker TEXT,
+    url TEXT UNIQUE,
+    title TEXT NOT NULL,
+    published REAL NOT NULL,
+    fetched REAL NOT NULL,
+    content_hash TEXT NOT NULL UNIQUE,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_by_ticker ON articles (ticker, published);
+CREATE INDEX IF NOT EXISTS articles_by_date ON articles (published);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    checked REAL NOT NULL,
+    article_id INTEGER
+);
+"""
+
+# Outcomes of a fetched URL (see ArticleStore.mark_url). STORED and DUPLICATE are
+# final; the others are checked again (conditionally) after a while.
+STORED = "stored"
+DUPLICATE = "duplicate"
+SHORT = "short"
+NO_BODY = "no_body"
+FINAL_STATUSES = (STORED, DUPLICATE)
+
+
+def content_hash(body):
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class ArticleStore:
+    """
+    News articles in SQLite: ticker, URL, publish time, content hash and body,
+    indexed by ticker and by date. URLs and bodies are unique, so storing an
+    article twice is a no-op. Every fetched URL is also remembered with its
+    outcome and cache validators, so it isn't downloaded again for nothing.
+    """
+
+    def __init__(self, path=ARTICLE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def add(self, ticker, url, title, body, published=None):
+        """Stores an article. Returns its id, or None if the URL or the same text is already stored."""
+        now = time.time()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO articles (ticker, url, title, published, fetched, content_hash, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ticker, url, title, published or now, now, content_hash(body), body),
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def has_url(self, url):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM articles WHERE url = ?", (url,)).fetchone() is not None
+
+    def url_info(self, urls):
+        """{url: {"status", "etag", "last_modified", "checked", "article_id"}} for the URLs fetched before."""
+        urls = list(urls)
+        if not urls:
+            return {}
+        placeholders = ",".join("?" * len(urls))
+        with self._lock:
+            rows = self._db.execute(f"SELECT * FROM urls WHERE url IN ({placeholders})", urls).fetchall()
+        return {row["url"]: dict(row) for row in rows}
+
+    def mark_url(self, url, status, etag=None, last_modified=None, article_id=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO urls (url, status, etag, last_modified, checked, article_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, status, etag, last_modified, time.time(), article_id),
+            )
+
+    def ids(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM articles")]
+
+    def get(self, ids):
+        """{id: {"id", "ticker", "url", "title", "published", "body"}} for the given ids."""
+        ids = list(ids)
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, ticker, url, title, published, body FROM articles WHERE id IN ({placeholders})", ids
+            ).fetchall()
+        return {row["id"]: dict(row) for row in rows}
+
+    def for_ticker(self, ticker, since=None, limit=50):
+        """The newest articles about a ticker (published after `since`), newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, ticker, url, title, published, body FROM articles "
+                "WHERE ticker = ? AND published >= ? ORDER BY published DESC LIMIT ?",
+                (ticker, since or 0, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def prune(self, retention_days=RETENTION_DAYS):
+        """Deletes articles published more than `retention_days` ago. Returns how many were deleted."""
+        cutoff = time.time() - retention_days * 86400
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM urls WHERE checked < ?", (cutoff,))
+            return self._db.execute("DELETE FROM articles WHERE published < ?", (cutoff,)).rowcount
+
+    def import_directory(self, directory):
+        """
+        Imports the loose articles/<title>.txt files of older versions. The ticker
+        is taken from a "(TICKER)" in the title if there is one; the file time
+        stands in for the publish time.
+        """
+        imported = 0
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.endswith(".txt"):
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
+                body = f.read().strip()
+            if not body:
+                continue
+            title = os.path.splitext(entry.name)[0].replace("_", " ")
+            match = TICKER_IN_TITLE.search(title)
+            if self.add(match.group(1) if match else None, None, title, body, entry.stat().st_mtime):
+                imported += 1
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._db.close()
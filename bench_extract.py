@@ -0,0 +1,54 @@
+# Benchmarks article extraction: the old full BeautifulSoup parse against
+# article_extract, on page.html, a few variants of it that need the fallback
+# selectors, and any pages saved under saved_pages/ (or given as arguments).
+import glob
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from article_extract import extract_paragraphs
+
+ROUNDS = 5
+
+
+def old_extract(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    container = soup.find('div', class_='body yf-1ir6o1g')
+    if not container:
+        return []
+    text_parts = []
+    for tag in container.find_all(['p', 'h1', 'h2', 'h3', 'h4']):
+        if tag.find_parent(attrs={'data-testid': 'inarticle-ad'}):
+            continue
+        text = tag.get_text(strip=True)
+        if text:
+            text_parts.append(text)
+    return text_parts
+
+
+def timed(func, html):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = func(html)
+    return (time.perf_counter() - start) / ROUNDS * 1000, result
+
+
+with open("page.html", "r", encoding="utf-8") as f:
+    page = f.read()
+
+pages = {
+    "page.html": page,
+    "page.html, class hash renamed": page.replace("yf-1ir6o1g", "yf-0renamed"),
+    "page.html, no <article> wrapper": page.replace("<article", "<section").replace("</article>", "</section>"),
+}
+for path in sys.argv[1:] or sorted(glob.glob(os.path.join("saved_pages", "*.html"))):
+    with open(path, "r", encoding="utf-8") as f:
+        pages[path] = f.read()
+
+print(f"{'page':40} {'old ms':>8} {'new ms':>8} {'speedup':>8} {'old/new paragraphs':>20}")
+for name, html in pages.items():
+    old_ms, old_parts = timed(old_extract, html)
+    new_ms, new_parts = timed(extract_paragraphs, html)
+    print(f"{name[:40]:40} {old_ms:8.1f} {new_ms:8.1f} {old_ms / new_ms:7.0f}x {len(old_parts):>9}/{len(new_parts)}")
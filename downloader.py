@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+
+MAX_WORKERS = 4
+HOST_RATE = 1.0        # requests per second per host, on average
+HOST_BURST = 2         # requests a host may get back to back
+URL_TIMEOUT = 15       # seconds for one page, including waits and retries
+TOTAL_TIMEOUT = 60     # seconds for the whole batch
+MAX_ATTEMPTS = 3
+CHUNK_SIZE = 16 * 1024
+DEFAULT_RETRY_AFTER = 10
+RETRY_STATUSES = (429, 503)
+
+
+class TokenBucket:
+    """
+    Rate limit for one host: `rate` tokens per second, at most `capacity`
+    saved up. pause() blocks the host entirely (for Retry-After).
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def try_acquire(self, now):
+        """Takes a token if one is available. Returns 0, or the seconds until one will be."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds, now):
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        self.updated = now
+
+
+def retry_after_seconds(value, default=DEFAULT_RETRY_AFTER):
+    """Seconds to wait from a Retry-After header (delay in seconds or an HTTP date)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class Downloader:
+    """
+    Fetches pages on a bounded pool of worker threads with a token bucket per
+    host. Workers always take the next page from a host that has a token, so a
+    host that is throttled or paused for its Retry-After (after a 429/503) holds
+    up only its own pages. Every page has a deadline (from its first attempt)
+    and so does the batch; pages that miss it come back as None.
+    """
+
+    def __init__(self, session=None, headers=None, max_workers=MAX_WORKERS, rate=HOST_RATE, burst=HOST_BURST,
+                 url_timeout=URL_TIMEOUT, total_timeout=TOTAL_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.session = session or requests.Session()
+        self.headers = headers or {}
+        self.max_workers = max_workers
+        self.rate = rate
+        self.burst = burst
+        self.url_timeout = url_timeout
+        self.total_timeout = total_timeout
+        self.max_attempts = max_attempts
+        self._buckets = {}  # host -> TokenBucket, kept across batches
+        self._lock = threading.Lock()  # guards the buckets; shared by concurrent batches
+
+    def _get(self, url, headers, deadline):
+        """
+        GETs a page, body included, before `deadline`. requests' own timeout only
+        bounds each connect and read, so the body is streamed and the deadline
+        checked between chunks: a server that trickles bytes can't run past it.
+        """
+        response = self.session.get(url, headers=headers, stream=True, timeout=max(0.1, deadline - time.monotonic()))
+        chunks = []
+        try:
+            while True:
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Deadline reached while reading {url}")
+                # read1() returns what has arrived instead of waiting for a full chunk
+                chunk = response.raw.read1(CHUNK_SIZE, decode_content=True)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        except urllib3.exceptions.HTTPError as e:
+            raise requests.ConnectionError(e) from e
+        finally:
+            response.close()
+        response._content = b"".join(chunks)  # What requests does itself when not streaming, so .text works
+        return response
+
+    def fetch_all(self, urls, extra_headers=None):
+        """
+        {url: response or None} for all URLs, fetched concurrently within the batch
+        deadline. `extra_headers` ({url: headers}) adds per-URL headers, e.g. for
+        conditional requests.
+        """
+        extra_headers = extra_headers or {}
+        batch_deadline = time.monotonic() + self.total_timeout
+        results = dict.fromkeys(urls)
+        pending = {}     # host -> deque of urls waiting for that host
+        deadlines = {}   # url -> deadline, set on its first attempt
+        attempts = dict.fromkeys(results, 0)
+        for url in results:
+            pending.setdefault(urlsplit(url).netloc, deque()).append(url)
+        changed = threading.Condition(self._lock)
+        in_flight = [0]
+
+        def next_url():
+            """The next URL whose host has a token, or None when there is nothing left to do."""
+            with changed:
+                while True:
+                    now = time.monotonic()
+                    if now >= batch_deadline:
+                        return None
+                    wait = None
+                    for host, queue in pending.items():
+                        while queue and deadlines.get(queue[0], batch_deadline) <= now:
+                            print(f"Gave up on {queue[0]}: deadline reached while waiting for the host")
+                            queue.popleft()
+                        if not queue:
+                            continue
+                        bucket = self._buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+                        delay = bucket.try_acquire(now)
+                        if delay == 0:
+                            url = queue.popleft()
+                            deadlines.setdefault(url, min(batch_deadline, now + self.url_timeout))
+                            attempts[url] += 1
+                            in_flight[0] += 1
+                            return url
+                        wait = delay if wait is None else min(wait, delay)
+                    if wait is None and not in_flight[0]:
+                        return None  # Nothing pending and nothing that could be retried
+                    # Sleep until a host has a token, or until a running download finishes
+                    changed.wait(min(wait if wait is not None else batch_deadline - now, batch_deadline - now))
+
+        def worker():
+            while True:
+                url = next_url()
+                if url is None:
+                    return
+                response = None
+                try:
+                    response = self._get(url, {**self.headers, **extra_headers.get(url, {})}, deadlines[url])
+                except requests.RequestException as e:
+                    print(f"Error downloading {url}: {e}")
+                with changed:
+                    in_flight[0] -= 1
+                    now = time.monotonic()
+                    host = urlsplit(url).netloc
+                    if response is not None:
+                        results[url] = response
+                    retry = response is None or response.status_code in RETRY_STATUSES
+                    if response is not None and response.status_code in RETRY_STATUSES:
+                        delay = retry_after_seconds(response.headers.get("Retry-After"))
+                        print(f"Rate limited by {host}, pausing it for {delay:.0f} seconds")
+                        self._buckets[host].pause(delay, now)
+                        retry = now + delay < deadlines[url]
+                    if retry and attempts[url] < self.max_attempts and now < deadlines[url]:
+                        pending[host].appendleft(url)
+                    changed.notify_all()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(self.max_workers, len(results)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0.0, batch_deadline - time.monotonic()) + 1)
+        return results
@@ -0,0 +1,49 @@
+import numpy as np
+
+
+def lttb(times, values, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Picks `max_points` samples that keep the visual shape of the series: the
+    first and last sample are always kept, and from every bucket in between
+    the sample forming the largest triangle with the previous pick and the
+    average of the next bucket.
+
+    Args:
+        times: sorted sample times (any numeric type)
+        values: sample values
+        max_points (int): number of samples to keep (at least 3)
+
+    Returns:
+        numpy array of the indices of the kept samples, in order
+    """
+    n = len(times)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(times, dtype=np.float64)
+    y = np.asarray(values, dtype=np.float64)
+
+    # Bucket edges for the n - 2 samples between the first and the last
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        picked[i + 1] = a
+
+    return picked
@@ -0,0 +1,53 @@
+import time
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # Optional: without it every client simply gets JSON
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+MSGPACK_MIMETYPE = "application/x-msgpack"
+
+# Short keys for the frequent socket events in MessagePack mode (the dashboard maps them back)
+COMPACT_KEYS = {
+    "update": {"value": "v"},
+    "tick": {"ticker": "s", "price": "p"},
+}
+
+
+def negotiate(requested):
+    """The encoding to use for a client that asked for `requested`."""
+    return MSGPACK if requested == MSGPACK and msgpack is not None else JSON
+
+
+def pack(payload):
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_event(event, payload):
+    """MessagePack frame for a socket event, with short keys and an epoch "t" timestamp."""
+    keys = COMPACT_KEYS.get(event)
+    if keys is None:
+        return pack(payload)
+    compact = {keys.get(key, key): value for key, value in payload.items()}
+    compact["t"] = int(time.time())
+    return pack(compact)
+
+
+def encode_series(data):
+    """
+    Compact form of a history query (see save_live_data.query_history): times as
+    a start time plus deltas in seconds, every value column as raw little-endian
+    float64 bytes.
+    """
+    times = np.asarray(data["time"], dtype=np.int64)
+    series = {
+        "t0": int(times[0]) if len(times) else 0,
+        "dt": np.diff(times).tolist(),
+    }
+    for key, values in data.items():
+        if key != "time":
+            series[key] = np.asarray(values, dtype="<f8").tobytes()
+    return series
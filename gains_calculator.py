@@ -1,100 +1,181 @@
 import json
-from decimal import Decimal, getcontext
-import datetime
-from stockprice import get_stock_price  # This script needs access to this function
+import os
+from stockprice import get_latest_prices
+from money import to_micros, div_round, format_money
 
-# Set precision for financial math
-getcontext().prec = 10
+TRADE_HISTORY_FILE = "trade_history.json"
+AGGREGATES_FILE = "gains_aggregates.json"
 
-def get_gains_and_losses_data(file_path="trade_history.json"):
+# ---------------------- Per-ticker aggregates ----------------------
+# Running totals per ticker, updated every time a trade is logged so the
+# /gains page never has to replay the whole trade history. Share counts are
+# ints, cost and revenue are money micro-units (see money.py).
+
+def _empty_aggregate():
+    return {
+        "shares_bought": 0, "total_buy_cost": 0,
+        "shares_sold": 0, "total_sell_revenue": 0,
+    }
+
+def apply_trade(aggregates, action, ticker, quantity, price):
+    """Adds a single trade to the running per-ticker aggregates (in place)."""
+    quantity = int(quantity)
+    price = to_micros(price)
+    action = action.upper()
+
+    data = aggregates.setdefault(ticker, _empty_aggregate())
+    if action == "BUY":
+        data["shares_bought"] += quantity
+        data["total_buy_cost"] += quantity * price
+    elif action == "SELL":
+        data["shares_sold"] += quantity
+        data["total_sell_revenue"] += quantity * price
+    return aggregates
+
+def build_aggregates(trade_history):
+    """Replays a full trade history into per-ticker aggregates."""
+    aggregates = {}
+    for trade in trade_history:
+        apply_trade(aggregates, trade["action"], trade["ticker"], trade["quantity"], trade["price"])
+    return aggregates
+
+def _history_stamp(history_path):
+    """[size, mtime in ns] of the trade history file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(history_path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+def save_aggregates(aggregates, file_path=AGGREGATES_FILE, history_path=TRADE_HISTORY_FILE):
+    # The size and modification time of the trade history are stored alongside so
+    # we can tell when the history was changed without going through log_trade
+    # (e.g. edited by hand, even without changing its length).
+    with open(file_path, "w") as f:
+        json.dump({"history_stamp": _history_stamp(history_path), "units": "micros", "tickers": aggregates}, f, indent=4)
+
+def load_aggregates(file_path=AGGREGATES_FILE, history_path=TRADE_HISTORY_FILE):
     """
-    Reads trade history, calculates gains/losses, and returns the data as a dictionary.
+    Returns the per-ticker aggregates, rebuilding them from the trade history
+    when the aggregates file is missing or out of date.
     """
     try:
         with open(file_path, "r") as f:
+            stored = json.load(f)
+        if stored.get("units") == "micros" and stored.get("history_stamp") == _history_stamp(history_path):
+            return stored["tickers"]
+    except (IOError, json.JSONDecodeError, KeyError, AttributeError):
+        pass
+
+    try:
+        with open(history_path, "r") as f:
             trade_history = json.load(f)
     except (IOError, json.JSONDecodeError):
-        # Return a default structure if the file is missing or empty
-        return {
-            "summary": {
-                "total_realized_gains": "0.00",
-                "total_unrealized_gains": "0.00",
-                "total_combined_gains": "0.00"
-            },
-            "details": []
-        }
-
-    portfolio = {}
-
-    # Aggregate all trades
-    for trade in trade_history:
-        ticker = trade["ticker"]
-        quantity = Decimal(str(trade["quantity"]))
-        price = Decimal(str(trade["price"]))
-        action = trade["action"].upper()
-
-        if ticker not in portfolio:
-            portfolio[ticker] = {
-                "shares_bought": Decimal("0"), "total_buy_cost": Decimal("0"),
-                "shares_sold": Decimal("0"), "total_sell_revenue": Decimal("0"),
-            }
-
-        if action == "BUY":
-            portfolio[ticker]["shares_bought"] += quantity
-            portfolio[ticker]["total_buy_cost"] += quantity * price
-        elif action == "SELL":
-            portfolio[ticker]["shares_sold"] += quantity
-            portfolio[ticker]["total_sell_revenue"] += quantity * price
+        return {}
 
-    details = []
-    total_realized_gains = Decimal("0")
-    total_unrealized_gains = Decimal("0")
+    aggregates = build_aggregates(trade_history)
+    save_aggregates(aggregates, file_path, history_path)
+    return aggregates
+
+# ---------------------- Gains ----------------------
+
+def ticker_pnl(data, price=None):
+    """
+    Realized gain, unrealized gain and market value for one ticker's aggregates,
+    all in micro-units. `price` is the current price in micro-units, or None if
+    there is no quote (unrealized gain and market value are then 0).
+    """
+    shares_bought = data["shares_bought"]
+    if shares_bought <= 0:
+        return 0, 0, 0
 
-    # Calculate results for each ticker
-    for ticker, data in sorted(portfolio.items()): # Sort by ticker for consistent order
-        realized_gain = Decimal("0")
-        avg_buy_price = Decimal("0")
+    realized_gain = 0
+    if data["shares_sold"] > 0:
+        cost_of_shares_sold = div_round(data["shares_sold"] * data["total_buy_cost"], shares_bought)
+        realized_gain = data["total_sell_revenue"] - cost_of_shares_sold
 
+    unrealized_gain = 0
+    market_value = 0
+    current_holdings = shares_bought - data["shares_sold"]
+    if current_holdings > 0 and price is not None:
+        cost_of_holdings = div_round(current_holdings * data["total_buy_cost"], shares_bought)
+        market_value = current_holdings * price
+        unrealized_gain = market_value - cost_of_holdings
+
+    return realized_gain, unrealized_gain, market_value
+
+def compute_gains(aggregates, current_prices):
+    """
+    Calculates gains/losses from per-ticker aggregates and a {ticker: price}
+    mapping of the latest quotes. Tickers without a quote are reported as N/A.
+    """
+    details = []
+    total_realized_gains = 0
+    total_unrealized_gains = 0
+
+    # Calculate results for each ticker (all money in micro-units)
+    for ticker, data in sorted(aggregates.items()): # Sort by ticker for consistent order
+        avg_buy_price = 0
         if data["shares_bought"] > 0:
-            avg_buy_price = data["total_buy_cost"] / data["shares_bought"]
-        
-        if data["shares_sold"] > 0:
-            cost_of_shares_sold = data["shares_sold"] * avg_buy_price
-            realized_gain = data["total_sell_revenue"] - cost_of_shares_sold
-            total_realized_gains += realized_gain
-        
-        unrealized_gain = Decimal("0")
+            avg_buy_price = div_round(data["total_buy_cost"], data["shares_bought"])
+
         current_holdings = data["shares_bought"] - data["shares_sold"]
-        current_market_value = Decimal("0")
+        current_price = None
         current_price_str = "N/A"
-        
-        if current_holdings > 0:
-            cost_of_holdings = current_holdings * avg_buy_price
-            try:
-                # Use your existing function to get live prices
-                current_price = Decimal(str(get_stock_price(ticker, datetime.datetime.now())))
-                current_price_str = f"{current_price:,.2f}"
-                current_market_value = current_holdings * current_price
-                unrealized_gain = current_market_value - cost_of_holdings
-                total_unrealized_gains += unrealized_gain
-            except Exception:
-                # Fallback if price fetch fails
-                current_price = Decimal("0")
+        if current_holdings > 0 and current_prices.get(ticker) is not None:
+            current_price = to_micros(current_prices[ticker])
+            current_price_str = format_money(current_price)
+
+        realized_gain, unrealized_gain, current_market_value = ticker_pnl(data, current_price)
+        total_realized_gains += realized_gain
+        total_unrealized_gains += unrealized_gain
 
         details.append({
             "ticker": ticker,
-            "realized_gains": f"{realized_gain:,.2f}",
+            "realized_gains": format_money(realized_gain),
             "current_holdings": current_holdings,
-            "avg_buy_price": f"{avg_buy_price:,.2f}",
+            "avg_buy_price": format_money(avg_buy_price),
             "current_price": current_price_str,
-            "current_market_value": f"{current_market_value:,.2f}",
-            "unrealized_gains": f"{unrealized_gain:,.2f}",
+            "current_market_value": format_money(current_market_value),
+            "unrealized_gains": format_money(unrealized_gain),
         })
 
     summary = {
-        "total_realized_gains": f"{total_realized_gains:,.2f}",
-        "total_unrealized_gains": f"{total_unrealized_gains:,.2f}",
-        "total_combined_gains": f"{(total_realized_gains + total_unrealized_gains):,.2f}"
+        "total_realized_gains": format_money(total_realized_gains),
+        "total_unrealized_gains": format_money(total_unrealized_gains),
+        "total_combined_gains": format_money(total_realized_gains + total_unrealized_gains)
     }
-    
-    return {"summary": summary, "details": details}
\ No newline at end of file
+
+    return {"summary": summary, "details": details}
+
+def get_gains_and_losses_data(file_path=TRADE_HISTORY_FILE):
+    """
+    Calculates gains/losses from the stored per-ticker aggregates and returns the data as a dictionary.
+    """
+    aggregates = load_aggregates(history_path=file_path)
+
+    # Live quotes for the tickers that are still held, in one batched lookup
+    held = [ticker for ticker, data in aggregates.items() if data["shares_bought"] - data["shares_sold"] > 0]
+    try:
+        quotes = get_latest_prices(held)
+    except Exception:
+        # Fallback if price fetch fails
+        quotes = {}
+    current_prices = {ticker: quotes.get(ticker) for ticker in held}
+
+    return compute_gains(aggregates, current_prices)
+
+def diff_gains(previous, current):
+    """
+    Returns the part of `current` that changed since `previous` (both as returned
+    by compute_gains): only the summary fields and detail rows that differ, or
+    None if nothing changed.
+    """
+    if previous is None:
+        return current
+    summary = {key: value for key, value in current["summary"].items() if previous["summary"].get(key) != value}
+    old_rows = {row["ticker"]: row for row in previous["details"]}
+    details = [row for row in current["details"] if old_rows.get(row["ticker"]) != row]
+    if not summary and not details:
+        return None
+    return {"summary": summary, "details": details}
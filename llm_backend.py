@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+MAX_CONCURRENT_CALLS = 4
+CALL_TIMEOUT = 30      # seconds per model call attempt
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 1.0    # seconds; doubles per attempt, with full jitter
+
+ADVICES = ("buy", "hold", "sell")
+
+
+class GeminiBackend:
+    """Gemini through google-genai. The client is created on the first call, so importing needs no credentials."""
+
+    def __init__(self, model=DEFAULT_MODEL):
+        self.model = model
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from google import genai
+                self._client = genai.Client()  # Requires GEMINI_API_KEY set
+            return self._client
+
+    def generate(self, prompt, timeout):
+        response = self.client().models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config={"http_options": {"timeout": int(timeout * 1000)}},
+        )
+        return response.text
+
+
+class StubBackend:
+    """
+    Deterministic local stand-in for the model, for offline runs and load tests:
+    the same prompt always gets the same advice. Prompts that list "Tickers: ..."
+    (portfolio advice) get a JSON object with one advice per ticker. `latency`
+    simulates a slow upstream.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    @staticmethod
+    def _pick(*parts):
+        digest = hashlib.sha256("|".join(parts).encode("utf-8")).digest()
+        return ADVICES[digest[0] % len(ADVICES)]
+
+    def generate(self, prompt, timeout):
+        self.calls += 1
+        if self.latency:
+            time.sleep(min(self.latency, timeout))
+            if self.latency > timeout:
+                raise TimeoutError(f"Stub call took longer than {timeout}s")
+        tickers = re.search(r"^\s*Tickers: (.+)$", prompt, re.MULTILINE)
+        if tickers:
+            return json.dumps({t.strip(): self._pick(t.strip(), prompt) for t in tickers.group(1).split(",")})
+        return self._pick(prompt)
+
+
+class LLM:
+    """
+    Guards a backend: at most `max_concurrent` calls in flight, a timeout per
+    attempt, and retries with exponential backoff and full jitter, all within an
+    overall deadline per call. Raises TimeoutError when no slot frees up in time
+    and re-raises the last error when every attempt failed.
+    """
+
+    def __init__(self, backend, max_concurrent=MAX_CONCURRENT_CALLS, timeout=CALL_TIMEOUT,
+                 max_attempts=MAX_ATTEMPTS, backoff=RETRY_BACKOFF):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def generate(self, prompt, deadline=None):
+        """The backend's answer to `prompt`, within `deadline` seconds (default: every attempt's full timeout)."""
+        deadline = time.monotonic() + (deadline if deadline is not None else self.timeout * self.max_attempts)
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise TimeoutError("No model call slot became free in time")
+        try:
+            for attempt in range(self.max_attempts):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Model call deadline reached")
+                try:
+                    return self.backend.generate(prompt, min(self.timeout, remaining))
+                except Exception as e:
+                    delay = random.uniform(0, self.backoff * 2 ** attempt)
+                    if attempt == self.max_attempts - 1 or time.monotonic() + delay >= deadline:
+                        raise
+                    print(f"Model call failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+        finally:
+            self._slots.release()
+
+
+def backend_from_env():
+    """The backend named by ADVISOR_BACKEND: "gemini" (default) or "stub"."""
+    name = os.environ.get("ADVISOR_BACKEND", "gemini").lower()
+    if name == "stub":
+        return StubBackend(latency=float(os.environ.get("ADVISOR_STUB_LATENCY", "0")))
+    if name == "gemini":
+        return GeminiBackend(os.environ.get("ADVISOR_MODEL", DEFAULT_MODEL))
+    raise ValueError(f"Unknown ADVISOR_BACKEND: {name!r}")
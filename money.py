@@ -0,0 +1,60 @@
+import numbers
+from decimal import Decimal, Context, ROUND_HALF_EVEN
+import numpy as np
+
+# Money is kept as a plain int counting micro-units (1/1,000,000 of a dollar).
+# Sums and share multiplications stay exact, and bulk work can be done on
+# int64 numpy arrays without going through Decimal.
+MICROS = 1_000_000
+
+# Own context so whatever global Decimal precision a caller sets can't round us
+_CONTEXT = Context(prec=38, rounding=ROUND_HALF_EVEN)
+_MICROS_DECIMAL = Decimal(MICROS)
+
+# ---------------------- Scalars ----------------------
+
+def to_micros(value) -> int:
+    """Converts a price or amount (int, float, str or Decimal) to micro-units."""
+    if isinstance(value, numbers.Integral):
+        return int(value) * MICROS
+    if isinstance(value, float):
+        return round(value * MICROS)
+    return int(_CONTEXT.multiply(Decimal(value), _MICROS_DECIMAL).to_integral_value(context=_CONTEXT))
+
+def from_micros(micros: int) -> float:
+    """Converts micro-units back to a float, for JSON and charts."""
+    return micros / MICROS
+
+def div_round(numerator: int, denominator: int) -> int:
+    """Integer division rounded half away from zero."""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+def format_money(micros: int) -> str:
+    """Formats micro-units as a dollar amount with two decimals, e.g. '1,234.56'."""
+    return f"{_CONTEXT.divide(Decimal(micros), _MICROS_DECIMAL):,.2f}"
+
+# ---------------------- Arrays ----------------------
+
+def bulk_market_value(quantities, prices_micros) -> np.ndarray:
+    """Market value per position (quantity * price) in micro-units."""
+    return np.asarray(quantities, dtype=np.int64) * np.asarray(prices_micros, dtype=np.int64)
+
+def bulk_pnl(quantities, cost_micros, prices_micros):
+    """
+    Vectorized profit/loss for many positions at once.
+
+    Args:
+        quantities: shares held per position
+        cost_micros: total cost basis per position, in micro-units
+        prices_micros: current price per share, in micro-units
+
+    Returns:
+        (market_values, pnl) as int64 arrays in micro-units
+    """
+    market_values = bulk_market_value(quantities, prices_micros)
+    return market_values, market_values - np.asarray(cost_micros, dtype=np.int64)
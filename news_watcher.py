@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+
+NEWS_INTERVAL = 30 * 60     # seconds between news checks for one ticker
+MAX_BACKOFF = 6 * 3600      # longest wait after repeated failures
+
+
+class NewsWatcher:
+    """
+    Keeps the article store current for a changing set of tickers (held and
+    watched). Meant to be called often from the scheduler: each call fetches news
+    for at most one ticker, the most overdue one. New tickers get a random first
+    slot within the interval so they don't all come due together, and a ticker
+    whose fetch fails waits twice as long after every failure (up to MAX_BACKOFF).
+    """
+
+    def __init__(self, fetch, tickers, interval=NEWS_INTERVAL, max_backoff=MAX_BACKOFF):
+        self.fetch = fetch          # fetch(ticker) -> new article ids
+        self.tickers = tickers      # tickers() -> tickers to watch
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._state = {}  # ticker -> {"due", "failures", "last_fetched", "last_new", "last_error"}
+
+    def _sync_tickers(self, now):
+        current = set(self.tickers())
+        for ticker in list(self._state):
+            if ticker not in current:
+                del self._state[ticker]
+        for ticker in current - set(self._state):
+            self._state[ticker] = {
+                "due": now + random.uniform(0, self.interval),
+                "failures": 0,
+                "last_fetched": None,
+                "last_new": None,
+                "last_error": None,
+            }
+
+    def run_once(self):
+        """Fetches news for the most overdue ticker, if any is due. Returns that ticker or None."""
+        now = time.time()
+        with self._lock:
+            self._sync_tickers(now)
+            due = [(state["due"], ticker) for ticker, state in self._state.items() if state["due"] <= now]
+            if not due:
+                return None
+            ticker = min(due)[1]
+            # Claim the slot so an overlapping call doesn't fetch the same ticker
+            self._state[ticker]["due"] = now + self.interval
+
+        try:
+            new_ids = self.fetch(ticker)
+        except Exception as e:
+            with self._lock:
+                state = self._state.get(ticker)
+                if state is not None:
+                    state["failures"] += 1
+                    state["last_error"] = f"{type(e).__name__}: {e}"
+                    backoff = min(self.interval * 2 ** state["failures"], self.max_backoff)
+                    state["due"] = time.time() + backoff * random.uniform(0.9, 1.1)
+            print(f"News check for {ticker} failed: {e}")
+            return ticker
+
+        self.mark_fetched(ticker, len(new_ids or []))
+        return ticker
+
+    def mark_fetched(self, ticker, new_articles=0):
+        """Records a successful fetch (also one made outside the watcher) and schedules the next one."""
+        now = time.time()
+        with self._lock:
+            state = self._state.get(ticker)
+            if state is None:
+                return
+            state.update(
+                due=now + self.interval * random.uniform(0.9, 1.1),
+                failures=0,
+                last_fetched=now,
+                last_new=new_articles,
+                last_error=None,
+            )
+
+    def is_fresh(self, ticker, max_age=None):
+        """Whether the ticker's news was fetched within `max_age` seconds (default: the interval)."""
+        max_age = self.interval if max_age is None else max_age
+        with self._lock:
+            state = self._state.get(ticker)
+            return bool(state and state["last_fetched"] and time.time() - state["last_fetched"] <= max_age)
+
+    def stats(self):
+        with self._lock:
+            return {ticker: dict(state) for ticker, state in sorted(self._state.items())}
@@ -0,0 +1,195 @@
+import json
+import os
+import datetime
+import numpy as np
+from gains_calculator import apply_trade, ticker_pnl, TRADE_HISTORY_FILE
+from stockprice import get_daily_closes
+from money import to_micros, MICROS
+
+PNL_HISTORY_FILE = "pnl_history.npz"
+
+# Stored arrays (money in micro-units, see money.py):
+#   days         int32 [n_days]             date ordinals, one per calendar day
+#   tickers      str   [n_tickers]
+#   realized     int64 [n_tickers, n_days]  realized P&L at the end of each day
+#   unrealized   int64 [n_tickers, n_days]  unrealized P&L at that day's close
+#   closes       int64 [n_tickers, n_days]  close used for the day (carried over weekends), 0 if none
+#   aggregates   int64 [n_tickers, 4]       running trade aggregates after the last day
+#   trade_count  int64                      how many trades of the history were replayed
+
+AGGREGATE_KEYS = ("shares_bought", "total_buy_cost", "shares_sold", "total_sell_revenue")
+
+
+def _trade_date(trade):
+    return datetime.datetime.fromisoformat(trade["timestamp"]).date()
+
+
+def load_pnl_history(file_path=PNL_HISTORY_FILE):
+    if not os.path.exists(file_path):
+        return None
+    with np.load(file_path) as stored:
+        return {key: stored[key] for key in stored.files}
+
+
+def save_pnl_history(history, file_path=PNL_HISTORY_FILE):
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **history)
+    os.replace(tmp_path, file_path)
+
+
+def update_pnl_history(today=None, file_path=PNL_HISTORY_FILE, history_path=TRADE_HISTORY_FILE):
+    """
+    Extends the stored P&L series up to yesterday (the last closed day).
+
+    Only trades and days that were not replayed before are processed, and the
+    closes for the new days are downloaded with one request per ticker.
+    Returns the history arrays, or None if there are no trades yet.
+    """
+    today = today or datetime.date.today()
+    last_day = today - datetime.timedelta(days=1)
+
+    history = load_pnl_history(file_path)
+    if history is not None and history["days"].size and history["days"][-1] >= last_day.toordinal():
+        return history
+
+    try:
+        with open(history_path, "r") as f:
+            trades = json.load(f)
+    except (IOError, json.JSONDecodeError):
+        trades = []
+
+    # History shrank (edited by hand): start over
+    if history is not None and int(history["trade_count"]) > len(trades):
+        history = None
+
+    if history is None:
+        if not trades:
+            return None
+        tickers = []
+        aggregates = {}
+        trade_count = 0
+        start_day = _trade_date(trades[0])
+        last_close = {}
+    else:
+        tickers = [str(ticker) for ticker in history["tickers"]]
+        aggregates = {
+            ticker: dict(zip(AGGREGATE_KEYS, (int(v) for v in row)))
+            for ticker, row in zip(tickers, history["aggregates"])
+        }
+        trade_count = int(history["trade_count"])
+        start_day = datetime.date.fromordinal(int(history["days"][-1]) + 1)
+        last_close = {
+            ticker: int(close) or None
+            for ticker, close in zip(tickers, history["closes"][:, -1])
+        }
+
+    if start_day > last_day:
+        return history
+
+    # Trades that belong to the days we are about to add
+    pending = []
+    for trade in trades[trade_count:]:
+        if _trade_date(trade) > last_day:
+            break
+        pending.append(trade)
+
+    for trade in pending:
+        if trade["ticker"] not in tickers:
+            tickers.append(trade["ticker"])
+
+    # One download per ticker that is (or becomes) held in the new days
+    held = {ticker for ticker, data in aggregates.items() if data["shares_bought"] > data["shares_sold"]}
+    held.update(trade["ticker"] for trade in pending if trade["action"].upper() == "BUY")
+    # yfinance reports most download errors with an empty result, so no closes at
+    # all over a span with weekdays in it counts as a failed download too
+    span = min(7, (last_day - start_day).days + 1)
+    has_weekday = any((start_day + datetime.timedelta(days=i)).weekday() < 5 for i in range(span))
+    closes = {}
+    for ticker in sorted(held):
+        try:
+            closes[ticker] = get_daily_closes(ticker, start_day, last_day + datetime.timedelta(days=1))
+        except Exception as e:
+            print(f"Error fetching daily closes for {ticker}: {e}")
+            closes[ticker] = {}
+        if not closes[ticker] and has_weekday:
+            # Saving these days with missing closes would leave them wrong for good, since
+            # later runs only add the days after the last stored one: try again next time
+            print(f"No daily closes for {ticker} from {start_day} to {last_day}, not extending the P&L history")
+            return history
+
+    n_days = (last_day - start_day).days + 1
+    new_days = np.arange(start_day.toordinal(), last_day.toordinal() + 1, dtype=np.int32)
+    new_realized = np.zeros((len(tickers), n_days), dtype=np.int64)
+    new_unrealized = np.zeros((len(tickers), n_days), dtype=np.int64)
+    new_closes = np.zeros((len(tickers), n_days), dtype=np.int64)
+
+    # Replay day by day
+    next_trade = 0
+    for col in range(n_days):
+        day = start_day + datetime.timedelta(days=col)
+        while next_trade < len(pending) and _trade_date(pending[next_trade]) <= day:
+            trade = pending[next_trade]
+            apply_trade(aggregates, trade["action"], trade["ticker"], trade["quantity"], trade["price"])
+            next_trade += 1
+
+        for row, ticker in enumerate(tickers):
+            close = closes.get(ticker, {}).get(day)
+            if close is not None:
+                last_close[ticker] = to_micros(close)
+            price = last_close.get(ticker)
+            if ticker in aggregates:
+                realized, unrealized, _ = ticker_pnl(aggregates[ticker], price)
+                new_realized[row, col] = realized
+                new_unrealized[row, col] = unrealized
+            new_closes[row, col] = price or 0
+
+    def extend(old, new):
+        # Pad the stored rows for tickers that appeared for the first time
+        if old is None:
+            return new
+        padded = np.zeros((len(tickers), old.shape[1]), dtype=np.int64)
+        padded[:old.shape[0]] = old
+        return np.concatenate([padded, new], axis=1)
+
+    history = {
+        "days": new_days if history is None else np.concatenate([history["days"], new_days]),
+        "tickers": np.array(tickers, dtype=str),
+        "realized": extend(None if history is None else history["realized"], new_realized),
+        "unrealized": extend(None if history is None else history["unrealized"], new_unrealized),
+        "closes": extend(None if history is None else history["closes"], new_closes),
+        "aggregates": np.array(
+            [[aggregates.get(ticker, {}).get(key, 0) for key in AGGREGATE_KEYS] for ticker in tickers],
+            dtype=np.int64,
+        ).reshape(len(tickers), len(AGGREGATE_KEYS)),
+        "trade_count": np.int64(trade_count + len(pending)),
+    }
+    save_pnl_history(history, file_path)
+    return history
+
+
+def get_pnl_series(file_path=PNL_HISTORY_FILE, history_path=TRADE_HISTORY_FILE):
+    """
+    Returns the daily realized/unrealized/total P&L, overall and per ticker,
+    as a JSON-friendly dictionary (amounts in dollars).
+    """
+    history = update_pnl_history(file_path=file_path, history_path=history_path)
+    if history is None or not history["days"].size:
+        return {"dates": [], "total": {"realized": [], "unrealized": [], "total": []}, "tickers": {}}
+
+    def series(realized, unrealized):
+        return {
+            "realized": (realized / MICROS).tolist(),
+            "unrealized": (unrealized / MICROS).tolist(),
+            "total": ((realized + unrealized) / MICROS).tolist(),
+        }
+
+    realized, unrealized = history["realized"], history["unrealized"]
+    return {
+        "dates": [datetime.date.fromordinal(int(day)).isoformat() for day in history["days"]],
+        "total": series(realized.sum(axis=0), unrealized.sum(axis=0)),
+        "tickers": {
+            str(ticker): series(realized[row], unrealized[row])
+            for row, ticker in enumerate(history["tickers"])
+        },
+    }
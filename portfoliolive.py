@@ -1,23 +1,170 @@
-import json
-from stockprice import get_stock_price
-import datetime
-def total_worth():
-    with open("portfolio.json", "r") as f:
-        portfolio = json.load(f)
+import os
+import threading
+from stockprice import get_latest_prices
+from stocky import load_portfolio, PORTFOLIO_FILE
+from money import to_micros, from_micros, div_round, bulk_pnl
+
+def aggregate_positions(portfolio):
+    """Collapses the portfolio lots into {ticker: {"quantity", "cost"}} (cost in micro-units)."""
+    positions = {}
+    for stock in portfolio:
+        position = positions.setdefault(stock["ticker"], {"quantity": 0, "cost": 0})
+        position["quantity"] += stock["quantity"]
+        position["cost"] += stock["quantity"] * to_micros(stock["price"])
+    return positions
+
+def portfolio_positions(portfolio, prices):
+    """
+    Per-ticker view of the portfolio for the dashboard: quantity, average buy
+    price, cost and, where `prices` ({ticker: price}) has a quote, the current
+    price, market value and P&L (in dollars), with the individual lots under "lots".
+    """
+    positions = aggregate_positions(portfolio)
+    lots = {}
+    for stock in portfolio:
+        lots.setdefault(stock["ticker"], []).append(
+            {"quantity": stock["quantity"], "price": stock["price"], "timestamp": stock.get("timestamp")}
+        )
+
+    rows = []
+    for ticker in sorted(positions):
+        quantity, cost = positions[ticker]["quantity"], positions[ticker]["cost"]
+        price = prices.get(ticker)
+        row = {
+            "ticker": ticker,
+            "quantity": quantity,
+            "avg_price": from_micros(div_round(cost, quantity)) if quantity else 0.0,
+            "cost": from_micros(cost),
+            "current_price": price,
+            "market_value": None,
+            "pnl": None,
+            "lots": lots[ticker],
+        }
+        if price is not None:
+            value = quantity * to_micros(price)
+            row["market_value"] = from_micros(value)
+            row["pnl"] = from_micros(value - cost)
+        rows.append(row)
+    return rows
+
+def value_portfolio(portfolio=None):
+    """
+    Values the portfolio with one batched price lookup for all distinct tickers.
+
+    Returns:
+        dict: "total" (current worth minus cost), "cost", "current_worth" and a
+        per-ticker "breakdown", all in dollars
+    """
+    if portfolio is None:
+        portfolio = load_portfolio()
+    positions = aggregate_positions(portfolio)
+
+    tickers = sorted(positions)
+    quotes = get_latest_prices(tickers)
+    missing = [ticker for ticker in tickers if ticker not in quotes]
+    if missing:
+        raise ValueError(f"No price available for {', '.join(missing)}")
+    prices = [to_micros(quotes[ticker]) for ticker in tickers]
+    quantities = [positions[ticker]["quantity"] for ticker in tickers]
+    costs = [positions[ticker]["cost"] for ticker in tickers]
+    market_values, pnl = bulk_pnl(quantities, costs, prices)
+
+    breakdown = {
+        ticker: {
+            "quantity": quantities[i],
+            "cost": from_micros(costs[i]),
+            "price": from_micros(prices[i]),
+            "value": from_micros(int(market_values[i])),
+            "pnl": from_micros(int(pnl[i])),
+        }
+        for i, ticker in enumerate(tickers)
+    }
+    return {
+        "total": from_micros(int(pnl.sum())),
+        "cost": from_micros(sum(costs)),
+        "current_worth": from_micros(int(market_values.sum())),
+        "breakdown": breakdown,
+    }
+
+class MarkToMarket:
+    """
+    In-memory mark-to-market of the portfolio. Price ticks update only the
+    ticked ticker's contribution to the total, so each tick is O(1) and
+    nothing is re-read from disk unless portfolio.json changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.positions = {}  # ticker -> {"quantity", "cost"} in micro-units
+        self.prices = {}     # ticker -> last price in micro-units
+        self.total = 0       # sum of (value - cost) over the priced tickers, micro-units
+        self._portfolio_mtime = None
+        self.reload()
 
-    # Calculate total worth
-    total_worth = sum(stock["quantity"] * stock["price"] for stock in portfolio)
-    return total_worth
+    def _contribution(self, ticker):
+        position = self.positions[ticker]
+        price = self.prices.get(ticker)
+        if price is None:
+            return 0
+        return position["quantity"] * price - position["cost"]
+
+    def reload(self, portfolio=None):
+        """Re-reads the positions (after a trade) and recomputes the total from the known prices."""
+        if portfolio is None:
+            self._portfolio_mtime = os.path.getmtime(PORTFOLIO_FILE) if os.path.exists(PORTFOLIO_FILE) else None
+            portfolio = load_portfolio()
+        with self._lock:
+            self.positions = aggregate_positions(portfolio)
+            self.prices = {ticker: price for ticker, price in self.prices.items() if ticker in self.positions}
+            self.total = sum(self._contribution(ticker) for ticker in self.positions)
+
+    def reload_if_changed(self):
+        """Reloads the positions if portfolio.json was modified since the last load."""
+        mtime = os.path.getmtime(PORTFOLIO_FILE) if os.path.exists(PORTFOLIO_FILE) else None
+        if mtime != self._portfolio_mtime:
+            self.reload()
+            return True
+        return False
+
+    def on_tick(self, ticker, price):
+        """Applies a price tick. Returns True if the total changed."""
+        price = to_micros(price)
+        with self._lock:
+            if ticker not in self.positions or self.prices.get(ticker) == price:
+                return False
+            first_tick = ticker not in self.prices
+            old = self._contribution(ticker)
+            self.prices[ticker] = price
+            delta = self._contribution(ticker) - old
+            self.total += delta
+            return delta != 0 or first_tick
+
+    def tickers(self):
+        with self._lock:
+            return sorted(self.positions)
+
+    def latest_prices(self):
+        """{ticker: last price} for the held tickers that have been priced."""
+        with self._lock:
+            return {ticker: from_micros(price) for ticker, price in self.prices.items()}
+
+    def is_priced(self):
+        with self._lock:
+            return all(ticker in self.prices for ticker in self.positions)
+
+    @property
+    def value(self):
+        return from_micros(self.total)
+
+def total_worth():
+    # Calculate total worth (what the holdings cost, in dollars)
+    return from_micros(sum(position["cost"] for position in aggregate_positions(load_portfolio()).values()))
 
 def total_current_worth():
-    with open("portfolio.json", "r") as f:
-        portfolio = json.load(f)
-    total_value = sum(get_stock_price(stock["ticker"], datetime.datetime.now()) * stock["quantity"] for stock in portfolio)
-    return total_value
+    return value_portfolio()["current_worth"]
 
 def totaltotal():
-    final = total_current_worth() - total_worth()
-    return final
+    return value_portfolio()["total"]
 
 
 
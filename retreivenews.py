@@ -2,43 +2,56 @@ import os
 import time
 import re
 import requests
-from bs4 import BeautifulSoup
 import yfinance as yf
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from article_store import ArticleStore, RETENTION_DAYS, STORED, DUPLICATE, SHORT, NO_BODY, FINAL_STATUSES
+from article_index import ArticleIndex
+from downloader import Downloader
+from article_extract import extract_paragraphs
 
 NUM_ARTICLES = 8
-OUTPUT_DIR = "articles"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+RECHECK_SECONDS = 6 * 3600  # how long a page without a usable article is left alone before asking again
+OUTPUT_DIR = "articles"  # Loose <title>.txt files of older versions, imported into the store once
+
+article_store = ArticleStore()
+if article_store.count() == 0 and os.path.isdir(OUTPUT_DIR):
+    print(f"Imported {article_store.import_directory(OUTPUT_DIR)} articles from {OUTPUT_DIR}/")
+
+# Relevance index over the store, kept up to date as articles are saved
+article_index = ArticleIndex(article_store)
 
 # === SETUP SESSION WITH RETRIES ===
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
 }
 
+# 429/503 are left to the downloader, which pauses just that host for its Retry-After
 retry_strategy = Retry(
-    total=5,
-    status_forcelist=[429, 500, 502, 503, 504],
+    total=2,
+    status_forcelist=[500, 502, 504],
     allowed_methods=["HEAD", "GET", "OPTIONS"],
-    backoff_factor=2
+    backoff_factor=0.5
 )
 
-adapter = HTTPAdapter(max_retries=retry_strategy)
+adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=8)
 session = requests.Session()
 session.mount("http://", adapter)
 session.mount("https://", adapter)
 
+downloader = Downloader(session, headers)
+
 
 def safe_filename(title: str) -> str:
     """Convert article title to a safe filename."""
     return re.sub(r'[\\/*?:"<>|]', "", title).strip().replace(" ", "_")[:100] + ".txt"
 
 
-def fetch_news(ticker: str, num_articles: int = NUM_ARTICLES, output_dir: str = OUTPUT_DIR):
-    """Fetch news articles for a stock ticker and save them to text files."""
+def fetch_news(ticker: str, num_articles: int = NUM_ARTICLES, store: ArticleStore = None):
+    """Fetch news articles for a stock ticker and save them to the article store. Returns the new article ids."""
     ticker = ticker.upper()
-    os.makedirs(output_dir, exist_ok=True)
-    saved_files = []
+    store = store or article_store
+    saved_ids = []
 
     # === SEARCH FOR NEWS ===
     search_result = yf.Search(
@@ -58,67 +71,85 @@ def fetch_news(ticker: str, num_articles: int = NUM_ARTICLES, output_dir: str =
 
     articles = search_result.news[:num_articles]
 
-    for idx, article in enumerate(articles):
+    # === SKIP KNOWN PAGES ===
+    # Stored (or duplicate) pages are never fetched again; pages that had no usable
+    # article are rechecked after a while, conditionally if the server gave validators
+    seen = store.url_info(article["link"] for article in articles)
+    now = time.time()
+    to_fetch, conditional = [], {}
+    for article in articles:
+        url = article["link"]
+        info = seen.get(url)
+        if (info and info["status"] in FINAL_STATUSES) or store.has_url(url):
+            continue
+        if info and now - info["checked"] < RECHECK_SECONDS:
+            continue
+        to_fetch.append(article)
+        if info:
+            validators = {"If-None-Match": info["etag"], "If-Modified-Since": info["last_modified"]}
+            conditional[url] = {name: value for name, value in validators.items() if value}
+    if len(to_fetch) < len(articles):
+        print(f"Skipping {len(articles) - len(to_fetch)} already known articles")
+
+    # Download the remaining pages concurrently (rate limited per host), then process them in order
+    responses = downloader.fetch_all([article["link"] for article in to_fetch], conditional)
+
+    for idx, article in enumerate(to_fetch):
         url = article["link"]
         title = article["title"]
-        print(f"\n[{idx + 1}/{num_articles}] Processing: {title}\nURL: {url}")
+        print(f"\n[{idx + 1}/{len(to_fetch)}] Processing: {title}\nURL: {url}")
 
         try:
-            # Request the page
-            response = session.get(url, headers=headers)
-            if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", 10))
-                print(f"Rate limited. Retrying in {retry_after} seconds...")
-                time.sleep(retry_after)
-                response = session.get(url, headers=headers)
+            response = responses.get(url)
+            if response is None:
+                print("Failed to download article: no response in time")
+                continue
+
+            if response.status_code == 304:
+                print("Not modified since the last check.")
+                store.mark_url(url, seen[url]["status"], seen[url]["etag"], seen[url]["last_modified"])
+                continue
 
             if response.status_code != 200:
                 print(f"Failed to download article: {response.status_code}")
                 continue
 
-            # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            container = soup.find('div', class_='body yf-1ir6o1g')
+            validators = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
 
-            if not container:
+            # Extract the article text (see article_extract for the selectors)
+            text_parts = extract_paragraphs(response.text)
+
+            if not text_parts:
                 print("Article body not found.")
+                store.mark_url(url, NO_BODY, *validators)
                 continue
 
-            # Extract text
-            text_parts = []
-            for tag in container.find_all(['p', 'h1', 'h2', 'h3', 'h4']):
-                if tag.find_parent(attrs={'data-testid': 'inarticle-ad'}):
-                    continue
-                text = tag.get_text(strip=True)
-                if text:
-                    text_parts.append(text)
-
-            if not text_parts:
-                print("No article content found.")
+            # Skip short articles (fewer than 3 non-empty paragraphs) before anything is stored
+            if len(text_parts) < 3:
+                print(f"Skipped short article: {title}")
+                store.mark_url(url, SHORT, *validators)
                 continue
 
-            # Save to file
-            filename = safe_filename(title)
-            filepath = os.path.join(output_dir, filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write('\n\n'.join(text_parts))
+            # Same text under another URL (a syndicated copy): remember the URL, keep one copy
+            body = '\n\n'.join(text_parts)
+            article_id = store.add(ticker, url, title, body, article.get("providerPublishTime"))
+            if article_id is None:
+                print(f"Duplicate of a stored article: {title}")
+                store.mark_url(url, DUPLICATE)
+                continue
 
-            saved_files.append(filepath)
-            print(f"Saved: {filepath}")
+            store.mark_url(url, STORED, article_id=article_id)
+            saved_ids.append(article_id)
+            print(f"Saved: {title}")
 
         except Exception as e:
             print(f"Error processing article: {e}")
 
-    # === CLEANUP SHORT ARTICLES ===
-    final_files = []
-    for filepath in saved_files:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        if len([line for line in lines if line.strip()]) < 3:
-            os.remove(filepath)
-            print(f"Deleted short article: {os.path.basename(filepath)}")
-        else:
-            final_files.append(filepath)
+    # === RETENTION ===
+    pruned = store.prune(RETENTION_DAYS)
+    if pruned:
+        print(f"Pruned {pruned} articles older than {RETENTION_DAYS} days")
 
-    return final_files
+    if store is article_store:
+        article_index.add(saved_ids)
+    return saved_ids
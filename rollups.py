@@ -0,0 +1,76 @@
+import threading
+import numpy as np
+from timeseries_store import TimeSeriesStore, TIME_SUFFIX
+
+OHLC_COLUMNS = ("open", "high", "low", "close")
+
+
+class Rollup:
+    """
+    OHLC aggregate of a raw series at a fixed bucket size, updated as samples
+    arrive. Finished buckets are appended to their own TimeSeriesStore; the
+    bucket that is still filling up lives in memory.
+    """
+
+    def __init__(self, name, bucket_seconds, directory, segment_seconds, retention_seconds=None):
+        self.name = name
+        self.bucket_seconds = bucket_seconds
+        self.retention_seconds = retention_seconds
+        self.store = TimeSeriesStore(directory, columns=OHLC_COLUMNS,
+                                     segment_seconds=segment_seconds, retention_seconds=retention_seconds)
+        self._lock = threading.Lock()
+        self._current = None  # [bucket start, open, high, low, close]
+
+    def add(self, timestamp, value):
+        bucket = int(timestamp) - int(timestamp) % self.bucket_seconds
+        with self._lock:
+            current = self._current
+            if current is not None and bucket < current[0]:
+                return  # older than the bucket being built, already rolled up
+            if current is not None and bucket == current[0]:
+                current[2] = max(current[2], value)
+                current[3] = min(current[3], value)
+                current[4] = value
+                return
+            if current is not None:
+                self.store.append(*current)
+            self._current = [bucket, value, value, value, value]
+
+    def catch_up(self, raw_store):
+        """Rolls up the raw samples newer than the last finished bucket (after a restart)."""
+        last = self.store.last_time()
+        start = None if last is None else last + self.bucket_seconds
+        raw = raw_store.read(start)
+        column = raw_store.columns[0]
+        for timestamp, value in zip(raw[TIME_SUFFIX].tolist(), raw[column].tolist()):
+            self.add(timestamp, value)
+
+    def first_time(self):
+        """Start of the oldest bucket (finished or not), or None if there is none yet."""
+        first = self.store.first_time()
+        if first is not None:
+            return first
+        with self._lock:
+            return self._current[0] if self._current else None
+
+    def read(self, start=None, end=None):
+        """Buckets with start <= bucket time < end, including the one still filling up."""
+        data = self.store.read(start, end)
+        with self._lock:
+            current = list(self._current) if self._current else None
+        if current and (start is None or current[0] >= start) and (end is None or current[0] < end):
+            data[TIME_SUFFIX] = np.append(data[TIME_SUFFIX], current[0])
+            for column, value in zip(OHLC_COLUMNS, current[1:]):
+                data[column] = np.append(data[column], value)
+        return data
+
+
+def select_tier(tiers, span_seconds, min_points):
+    """
+    Picks the coarsest rollup that still gives at least `min_points` buckets over
+    the span. Returns None if only the raw samples are fine enough.
+    """
+    for tier in sorted(tiers, key=lambda t: t.bucket_seconds, reverse=True):
+        if span_seconds / tier.bucket_seconds >= min_points:
+            return tier
+    return None
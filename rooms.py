@@ -0,0 +1,74 @@
+import re
+import threading
+from framing import JSON
+
+PORTFOLIO_ROOM = "portfolio"
+TICKER_PATTERN = re.compile(r"^[A-Z0-9.\-^=]{1,15}$")
+ENCODING_SEPARATOR = "#"
+
+
+def ticker_room(ticker):
+    return f"ticker:{ticker}"
+
+
+def encoded_room(room, encoding):
+    """Socket.IO room for the members of `room` that use `encoding` (JSON members use the plain name)."""
+    return room if encoding == JSON else f"{room}{ENCODING_SEPARATOR}{encoding}"
+
+
+class RoomRegistry:
+    """
+    Keeps track of which Socket.IO clients are subscribed to which rooms, so
+    the server only prices and publishes what somebody is listening to.
+    Rooms are tracked per encoding (see encoded_room).
+    """
+
+    def __init__(self, max_rooms_per_client=50):
+        self.max_rooms_per_client = max_rooms_per_client
+        self._lock = threading.Lock()
+        self._members = {}  # room -> set of sids
+        self._rooms = {}    # sid -> set of rooms
+
+    def join(self, sid, room):
+        """Adds the client to the room. Returns False if the client is at its room limit."""
+        with self._lock:
+            rooms = self._rooms.setdefault(sid, set())
+            if room not in rooms and len(rooms) >= self.max_rooms_per_client:
+                return False
+            rooms.add(room)
+            self._members.setdefault(room, set()).add(sid)
+            return True
+
+    def leave(self, sid, room):
+        with self._lock:
+            self._rooms.get(sid, set()).discard(room)
+            members = self._members.get(room)
+            if members is not None:
+                members.discard(sid)
+                if not members:
+                    del self._members[room]
+
+    def leave_all(self, sid):
+        with self._lock:
+            for room in self._rooms.pop(sid, set()):
+                members = self._members.get(room)
+                if members is not None:
+                    members.discard(sid)
+                    if not members:
+                        del self._members[room]
+
+    def has_subscribers(self, room, encoding=None):
+        """Whether the room has members (using `encoding`, or any encoding if None)."""
+        with self._lock:
+            if encoding is not None:
+                return encoded_room(room, encoding) in self._members
+            return any(member.split(ENCODING_SEPARATOR)[0] == room for member in self._members)
+
+    def tickers(self):
+        """Tickers that at least one client is subscribed to."""
+        prefix = ticker_room("")
+        with self._lock:
+            return {
+                room.split(ENCODING_SEPARATOR)[0][len(prefix):]
+                for room in self._members if room.startswith(prefix)
+            }
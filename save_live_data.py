@@ -1,41 +1,175 @@
 # save_live_data.py
 import json
+import base64
 import datetime
 import os
+import time
 from portfoliolive import totaltotal
+from timeseries_store import TimeSeriesStore
+from rollups import Rollup, select_tier
+from downsample import lttb
 
-DATA_FILE = "portfolio_live.json"
-MAX_DAYS = 7
+DATA_DIR = "portfolio_live"
+LEGACY_DATA_FILE = "portfolio_live.json"
+DAY = 86400
+RAW_RETENTION_DAYS = 1
+MIN_CHART_POINTS = 48
 
-def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    return []
+# Raw minute samples, one segment per day; retention drops whole days
+store = TimeSeriesStore(DATA_DIR, columns=("total_worth",), retention_seconds=RAW_RETENTION_DAYS * DAY)
 
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+# OHLC rollups kept much longer than the raw samples: (name, bucket, segment, retention)
+ROLLUP_TIERS = [
+    ("5m", 300, 7 * DAY, 90 * DAY),
+    ("1h", 3600, 30 * DAY, 2 * 365 * DAY),
+    ("1d", DAY, 365 * DAY, None),
+]
+rollups = [
+    Rollup(name, bucket, os.path.join(DATA_DIR, name), segment, retention)
+    for name, bucket, segment, retention in ROLLUP_TIERS
+]
 
-def clean_old_data(data):
-    cutoff = datetime.datetime.now() - datetime.timedelta(days=MAX_DAYS)
-    return [entry for entry in data if datetime.datetime.fromisoformat(entry["timestamp"]) > cutoff]
+def import_legacy_data(file_path=LEGACY_DATA_FILE):
+    """
+    Copies the samples of the old portfolio_live.json into the store (once, while
+    the store is empty). They are rolled up as they go in, since the raw store
+    only keeps the last day and drops older days while the import appends.
+    """
+    if not store.is_empty() or not os.path.exists(file_path):
+        return 0
+    try:
+        with open(file_path, "r") as f:
+            data = json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return 0
 
-def record_portfolio_worth():
-    data = load_data()
-    current_value = totaltotal()
-    timestamp = datetime.datetime.now().isoformat(timespec="seconds")
+    samples = sorted(
+        (int(datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()), entry["total_worth"])
+        for entry in data
+    )
+    empty_rollups = [rollup for rollup in rollups if rollup.store.is_empty()]
+    for timestamp, value in samples:
+        store.append(timestamp, value)
+        for rollup in empty_rollups:
+            rollup.add(timestamp, value)
+    return len(samples)
 
-    # Add new entry
-    data.append({
-        "timestamp": timestamp,
-        "total_worth": current_value
-    })
+def _to_records(data):
+    """Turns query arrays ("time", "total_worth" and maybe "open"/"high"/"low") into a list of dicts."""
+    extra = [key for key in ("open", "high", "low") if key in data]
+    columns = [data[key].tolist() for key in ["time", "total_worth"] + extra]
+    return [
+        dict(
+            {"timestamp": datetime.datetime.fromtimestamp(row[0]).isoformat(timespec="seconds"), "total_worth": row[1]},
+            **dict(zip(extra, row[2:]))
+        )
+        for row in zip(*columns)
+    ]
 
-    # Remove old entries
-    data = clean_old_data(data)
+def query_data(start=None, end=None):
+    """Returns the recorded raw samples as arrays ("time", "total_worth"), oldest first."""
+    return store.read(start, end)
 
-    save_data(data)
+def load_data(start=None, end=None):
+    """Returns the recorded raw samples as [{"timestamp", "total_worth"}], oldest first."""
+    return _to_records(query_data(start, end))
+
+def encode_cursor(timestamp):
+    """Opaque sync cursor for "everything up to and including this sample time"."""
+    return base64.urlsafe_b64encode(f"raw:{timestamp}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Sample time of a cursor from encode_cursor; raises ValueError if it is not one."""
+    try:
+        kind, timestamp = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if kind != "raw":
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return int(timestamp)
+
+def query_since(cursor=""):
+    """
+    Returns (data, cursor): the raw samples recorded after `cursor` ("" for all of
+    them) as arrays ("time", "total_worth") and the cursor to pass on the next call.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    data = store.read(None if after is None else after + 1)
+    if not len(data["time"]):
+        return data, cursor
+    return data, encode_cursor(int(data["time"][-1]))
+
+def load_since(cursor=""):
+    """Like query_since, with the samples as [{"timestamp", "total_worth"}]."""
+    data, cursor = query_since(cursor)
+    return _to_records(data), cursor
+
+def oldest_sample_time(raw_start=None):
+    """
+    Epoch seconds of the oldest recorded worth, across the raw samples and the
+    rollups. A rollup only counts when it has whole buckets from before anything
+    finer, since bucket times are rounded down to the bucket size.
+    """
+    oldest = raw_start if raw_start is not None else store.first_time()
+    for rollup in sorted(rollups, key=lambda t: t.bucket_seconds):
+        first = rollup.first_time()
+        if first is not None and (oldest is None or first + rollup.bucket_seconds <= oldest):
+            oldest = first
+    return oldest
+
+def query_history(start=None, end=None, max_points=None, now=None):
+    """
+    Returns the worth history between start and end (epoch seconds), oldest first,
+    as arrays: "time", "total_worth" and, for rollups, "open"/"high"/"low".
+
+    Short spans come from the raw samples; longer ones from the coarsest rollup
+    that still has at least `max_points` buckets (or MIN_CHART_POINTS), reported
+    by their close with the OHLC values alongside. With `max_points` the result
+    is downsampled (LTTB) so its size is bounded by the chart, not the history.
+    """
+    now = int(now or time.time())
+    end = now if end is None else end
+    raw_start = store.first_time()
+    oldest = oldest_sample_time(raw_start)
+    if oldest is None:
+        return store.read(start, end)
+    # The tier is picked for the span there is data for, not the span asked for
+    start = oldest if start is None else max(start, oldest)
+
+    tier = select_tier(rollups, end - start, max_points or MIN_CHART_POINTS)
+    if tier is None and (raw_start is None or start < raw_start):
+        # Older than the raw samples go back: use the finest rollup instead
+        tier = min(rollups, key=lambda t: t.bucket_seconds)
+
+    if tier is None:
+        data = store.read(start, end)
+    else:
+        data = tier.read(start - start % tier.bucket_seconds, end)  # Including the bucket start falls in
+        data["total_worth"] = data.pop("close")
+
+    if max_points:
+        picked = lttb(data["time"], data["total_worth"], max_points)
+        data = {key: column[picked] for key, column in data.items()}
+    return data
+
+def load_history(start=None, end=None, max_points=None, now=None):
+    """Like query_history, with the samples as [{"timestamp", "total_worth", ...}]."""
+    return _to_records(query_history(start, end, max_points, now))
+
+def record_portfolio_worth(current_value=None):
+    """Records a worth sample; values the portfolio itself unless a value is passed in."""
+    if current_value is None:
+        current_value = totaltotal()
+
+    # Append the new sample; old days are dropped by the store
+    timestamp = time.time()
+    store.append(timestamp, current_value)
+    for rollup in rollups:
+        rollup.add(timestamp, current_value)
+
+import_legacy_data()
+for rollup in rollups:
+    rollup.catch_up(store)
 
 if __name__ == "__main__":
     record_portfolio_worth()
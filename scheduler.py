@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+
+
+class Job:
+    def __init__(self, name, interval, func, jitter=0.0):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.jitter = jitter
+        self.next_run = None      # monotonic time of the next slot (without jitter)
+        self.fire_at = None       # next_run plus this slot's jitter
+        self.running = False
+
+        # Stats
+        self.runs = 0
+        self.errors = 0
+        self.skipped_overlap = 0  # slot reached while the previous run was still busy
+        self.skipped_late = 0     # slots missed entirely (e.g. the machine was asleep)
+        self.last_latency = None
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_error = None
+        self.last_finished = None
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "errors": self.errors,
+            "skipped_overlap": self.skipped_overlap,
+            "skipped_late": self.skipped_late,
+            "last_latency": self.last_latency,
+            "avg_latency": self.total_latency / self.runs if self.runs else None,
+            "max_latency": self.max_latency,
+            "last_error": self.last_error,
+            "last_finished": self.last_finished,
+        }
+
+
+class Scheduler:
+    """
+    Runs named periodic jobs from one background thread.
+
+    Slots are computed from the start time (next = previous slot + interval),
+    so timing doesn't drift with job duration. Each run happens on its own
+    worker thread; if a job is still busy when its next slot comes the slot is
+    skipped, so a slow job never overlaps itself or holds up the others.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, interval, func, jitter=0.0, delay=0.0):
+        """
+        Registers `func` to run every `interval` seconds, first after `delay`.
+        Each run is pushed back by a random 0..`jitter` seconds.
+        """
+        job = Job(name, interval, func, jitter)
+        job.next_run = time.monotonic() + delay
+        job.fire_at = job.next_run + random.uniform(0, jitter)
+        with self._lock:
+            self._jobs[name] = job
+        self._wakeup.set()
+        return job
+
+    def remove_job(self, name):
+        with self._lock:
+            self._jobs.pop(name, None)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {name: job.stats() for name, job in self._jobs.items()}
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                jobs = list(self._jobs.values())
+
+            for job in jobs:
+                if job.fire_at > now:
+                    continue
+                if job.running:
+                    job.skipped_overlap += 1
+                else:
+                    job.running = True
+                    threading.Thread(target=self._run_job, args=(job,), daemon=True).start()
+
+                # Next slot on the fixed grid; slots already in the past are dropped
+                job.next_run += job.interval
+                while job.next_run <= now:
+                    job.next_run += job.interval
+                    job.skipped_late += 1
+                job.fire_at = job.next_run + random.uniform(0, job.jitter)
+
+            with self._lock:
+                next_fire = min((job.fire_at for job in self._jobs.values()), default=now + 1)
+            self._wakeup.wait(max(0.0, next_fire - time.monotonic()))
+
+    def _run_job(self, job):
+        started = time.monotonic()
+        try:
+            job.func()
+        except Exception as e:
+            job.errors += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"Job {job.name} failed: {e}")
+        finally:
+            latency = time.monotonic() - started
+            job.runs += 1
+            job.last_latency = latency
+            job.total_latency += latency
+            job.max_latency = max(job.max_latency, latency)
+            job.last_finished = time.time()
+            job.running = False
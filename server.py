@@ -1,25 +1,48 @@
-from flask import Flask, render_template_string
-from flask_socketio import SocketIO
-import json, time, threading, re
-from portfoliolive import totaltotal
+from flask import Flask, Response, render_template_string
+from flask_socketio import SocketIO, join_room, leave_room
+import json, time, threading, os, hashlib
+from portfoliolive import MarkToMarket, portfolio_positions
+from scheduler import Scheduler
+from advice_jobs import AdviceJobs, FETCHING_NEWS, ADVISING
+from news_watcher import NewsWatcher
+from rooms import RoomRegistry, PORTFOLIO_ROOM, TICKER_PATTERN, ticker_room, encoded_room
+from framing import JSON, MSGPACK, MSGPACK_MIMETYPE, negotiate, pack, encode_event, encode_series
 from flask import request, jsonify
-from aistocky import fetch_news, summarize_and_advise, load_portfolio, buy_stock, sell_stock
+from aistocky import fetch_news, summarize_and_advise, advise_portfolio, load_portfolio, buy_stock, sell_stock
 import datetime
-from stockprice import get_stock_price
-from save_live_data import record_portfolio_worth
-from gains_calculator import get_gains_and_losses_data
+from stockprice import get_latest_prices
+from stocky import PORTFOLIO_FILE
+from save_live_data import record_portfolio_worth, load_data, load_history, load_since, query_data, query_history, query_since
+from gains_calculator import get_gains_and_losses_data, load_aggregates, compute_gains, diff_gains
+from pnl_history import get_pnl_series
 
 app = Flask(__name__)
 socketio = SocketIO(app)
+mark_to_market = MarkToMarket()
+rooms = RoomRegistry()
+last_quotes = {}  # ticker -> last price, shared by the portfolio valuation and the ticker rooms
 
 # --- All backend routes are unchanged ---
+PORTFOLIO_CACHE_SECONDS = 5
+portfolio_cache = {"built_at": float("-inf")}  # "mtime" of portfolio.json, "built_at", "body", "etag" of the last /portfolio response
+portfolio_cache_lock = threading.Lock()
+
 @app.route("/portfolio", methods=["GET"])
 def get_portfolio():
-    portfolio_data = load_portfolio();
-    for stock in portfolio_data:
-        try: stock["current_price"] = get_stock_price(stock["ticker"], datetime.datetime.now())
-        except Exception: stock["current_price"] = None
-    return jsonify(portfolio_data)
+    """Positions by ticker with their lots, priced in one batched lookup; reused for a few seconds and served with an ETag."""
+    global portfolio_cache
+    mtime = os.path.getmtime(PORTFOLIO_FILE) if os.path.exists(PORTFOLIO_FILE) else None
+    with portfolio_cache_lock:
+        cached = portfolio_cache
+        if cached.get("mtime") != mtime or time.monotonic() - cached["built_at"] > PORTFOLIO_CACHE_SECONDS:
+            portfolio = load_portfolio()
+            try: prices = get_latest_prices(sorted({stock["ticker"] for stock in portfolio}))
+            except Exception as e: print(f"Error fetching portfolio prices: {e}"); prices = {}
+            body = json.dumps(portfolio_positions(portfolio, prices))
+            cached = portfolio_cache = {"mtime": mtime, "built_at": time.monotonic(), "body": body, "etag": hashlib.sha1(body.encode()).hexdigest()}
+    response = Response(cached["body"], mimetype="application/json")
+    response.set_etag(cached["etag"]); response.cache_control.max_age = PORTFOLIO_CACHE_SECONDS
+    return response.make_conditional(request)
 
 @app.route("/trade", methods=["POST"])
 def trade():
@@ -34,13 +57,51 @@ def trade():
             sell_stock(ticker, quantity); return jsonify({"result": f"Sold {quantity} shares of {ticker}."})
     except Exception as e: return jsonify({"error": str(e)}), 500
 
+def run_advice(ticker, progress):
+    """Advice job body: news (unless the watcher has it fresh), then the model, then the position for the trade controls."""
+    if not news_watcher.is_fresh(ticker): progress(FETCHING_NEWS); news_watcher.mark_fetched(ticker, len(fetch_news(ticker)))
+    progress(ADVISING); advice = summarize_and_advise(ticker); portfolio = load_portfolio()
+    owned_quantity = sum(item["quantity"] for item in portfolio if item["ticker"] == ticker)
+    return {"advice": advice, "owned_quantity": owned_quantity}
+
+def notify_advice(job, listeners):
+    for sid in listeners: socketio.emit('advice_progress', job.to_dict(), to=sid)
+
+def run_portfolio_advice(_, progress):
+    """Portfolio advice job body: news for the holdings the watcher doesn't have fresh, then one model call for all of them."""
+    portfolio = load_portfolio(); owned = {}
+    for item in portfolio: owned[item["ticker"]] = owned.get(item["ticker"], 0) + item["quantity"]
+    stale = [ticker for ticker in sorted(owned) if not news_watcher.is_fresh(ticker)]
+    if stale: progress(FETCHING_NEWS)
+    for ticker in stale: news_watcher.mark_fetched(ticker, len(fetch_news(ticker)))
+    progress(ADVISING)
+    return {"advice": advise_portfolio(sorted(owned)), "owned": owned}
+
+advice_jobs = AdviceJobs(run_advice, notify_advice, max_workers=2)
+portfolio_advice_jobs = AdviceJobs(run_portfolio_advice, notify_advice, max_workers=1)
+PORTFOLIO_ADVICE_KEY = "portfolio"
+
 @app.route("/aistock/advice", methods=["POST"])
 def get_advice():
-    data = request.json; ticker = data.get("ticker", "").upper()
+    """Starts an advice job (or joins the one already running for the ticker); progress goes to the "sid" socket, if given."""
+    data = request.json or {}; ticker = data.get("ticker", "").upper()
     if not ticker: return jsonify({"error": "Ticker required"}), 400
-    fetch_news(ticker); advice = summarize_and_advise(ticker); portfolio = load_portfolio()
-    owned_quantity = sum(item["quantity"] for item in portfolio if item["ticker"] == ticker)
-    return jsonify({"advice": advice, "owned_quantity": owned_quantity})
+    job = advice_jobs.submit(ticker, listener=data.get("sid"))
+    if job is None: return jsonify({"error": "Too many advice requests in progress, try again later"}), 503
+    return jsonify(job.to_dict()), 202
+
+@app.route("/aistock/advice/portfolio", methods=["POST"])
+def get_portfolio_advice():
+    """Starts (or joins) the job that advises on all holdings in one model call."""
+    data = request.json or {}
+    job = portfolio_advice_jobs.submit(PORTFOLIO_ADVICE_KEY, listener=data.get("sid"))
+    return jsonify(job.to_dict()), 202
+
+@app.route("/aistock/advice/<job_id>", methods=["GET"])
+def get_advice_job(job_id):
+    job = advice_jobs.get(job_id) or portfolio_advice_jobs.get(job_id)
+    if job is None: return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
 
 @app.route("/aistock/execute", methods=["POST"])
 def execute_trade():
@@ -50,18 +111,64 @@ def execute_trade():
     elif advice == "sell": sell_qty = min(qty, owned_quantity); sell_stock(ticker, sell_qty); return jsonify({"result": f"Sold {sell_qty} shares of {ticker}."})
     else: return jsonify({"result": "No action taken."})
 
+HISTORY_RANGES = {"1h": 3600, "1d": 86400, "1w": 7 * 86400, "1m": 30 * 86400, "1y": 365 * 86400}
+MAX_HISTORY_POINTS = 5000
+
+def parse_time(value):
+    """Epoch seconds or an ISO date/time, as epoch seconds."""
+    try: return int(float(value))
+    except ValueError: return int(datetime.datetime.fromisoformat(value).timestamp())
+
+def wants_msgpack():
+    """MessagePack if the client asked for it (?format=msgpack or Accept) and the server can encode it."""
+    requested = request.args.get("format") or (MSGPACK if request.accept_mimetypes.best == MSGPACK_MIMETYPE else JSON)
+    return negotiate(requested) == MSGPACK
+
 @app.route("/history")
 def history():
-    try:
-        with open("portfolio_live.json", "r") as f: raw = f.read()
-        cleaned = "[" + ",".join(re.findall(r"\{.*?\}", raw, re.S)) + "]"; data = json.loads(cleaned)
+    args = request.args; range_name = args.get("range"); packed = wants_msgpack()
+    if "since" in args:
+        # Incremental sync: only the raw samples after the client's cursor
+        try: data, cursor = query_since(args["since"]) if packed else load_since(args["since"])
+        except ValueError as e: return jsonify({"error": str(e)}), 400
+        if packed: return Response(pack({"data": encode_series(data), "cursor": cursor}), mimetype=MSGPACK_MIMETYPE)
         for d in data: d["timestamp"] = d["timestamp"].replace("T", " ")
-        data.sort(key=lambda x: x["timestamp"]); return jsonify(data)
-    except (FileNotFoundError, json.JSONDecodeError): return jsonify([])
+        return jsonify({"data": data, "cursor": cursor})
+    if range_name is not None and range_name not in HISTORY_RANGES: return jsonify({"error": "Invalid range"}), 400
+    try:
+        start = parse_time(args["start"]) if "start" in args else None; end = parse_time(args["end"]) if "end" in args else None
+        max_points = int(args["max_points"]) if "max_points" in args else None
+    except ValueError: return jsonify({"error": "start/end must be epoch seconds or ISO times, max_points an integer"}), 400
+    if max_points is not None and not 3 <= max_points <= MAX_HISTORY_POINTS: return jsonify({"error": f"max_points must be between 3 and {MAX_HISTORY_POINTS}"}), 400
+    if range_name: end = end or int(time.time()); start = end - HISTORY_RANGES[range_name]
+    everything = start is None and end is None and max_points is None
+    if packed: return Response(pack(encode_series(query_data() if everything else query_history(start, end, max_points))), mimetype=MSGPACK_MIMETYPE)
+    data = load_data() if everything else load_history(start, end, max_points)
+    for d in data: d["timestamp"] = d["timestamp"].replace("T", " ")
+    return jsonify(data)
+
+@app.route("/gains/history")
+def gains_history():
+    try: return jsonify(get_pnl_series())
+    except Exception as e: return jsonify({"error": str(e)}), 500
+
+last_gains = None  # Gains as last pushed to the /gains page; only push_gains() moves this baseline
+
+def current_gains():
+    """Gains from the cached aggregates and the latest ticks, or priced from scratch before the first ticks."""
+    if not mark_to_market.is_priced(): return get_gains_and_losses_data()
+    return compute_gains(load_aggregates(), mark_to_market.latest_prices())
+
+def push_gains():
+    """Emits only the gains rows and summary fields that changed since the last push."""
+    global last_gains
+    previous = last_gains; current = last_gains = current_gains()
+    changes = diff_gains(previous, current) if previous is not None else None  # First run only sets the baseline
+    if changes: publish('update_gains', changes, PORTFOLIO_ROOM)
 
 @app.route("/gains")
 def gains_page():
-    gains_data = get_gains_and_losses_data()
+    gains_data = current_gains()
     return render_template_string("""
     <!DOCTYPE html>
     <html lang="en">
@@ -78,26 +185,54 @@ def gains_page():
             <h1>Portfolio Gains & Losses</h1>
             <h2>Overall Summary</h2>
             <div id="summary-container" class="summary-box">
-                <div class="summary-item"><h3>Realized Gains</h3><p class="{{ 'positive' if data.summary.total_realized_gains|float >= 0 else 'negative' }}">${{ data.summary.total_realized_gains }}</p></div>
-                <div class="summary-item"><h3>Unrealized Gains</h3><p class="{{ 'positive' if data.summary.total_unrealized_gains|float >= 0 else 'negative' }}">${{ data.summary.total_unrealized_gains }}</p></div>
-                <div class="summary-item"><h3>Total Combined</h3><p class="{{ 'positive' if data.summary.total_combined_gains|float >= 0 else 'negative' }}">${{ data.summary.total_combined_gains }}</p></div>
+                <div class="summary-item"><h3>Realized Gains</h3><p id="total_realized_gains" class="{{ 'positive' if data.summary.total_realized_gains|float >= 0 else 'negative' }}">${{ data.summary.total_realized_gains }}</p></div>
+                <div class="summary-item"><h3>Unrealized Gains</h3><p id="total_unrealized_gains" class="{{ 'positive' if data.summary.total_unrealized_gains|float >= 0 else 'negative' }}">${{ data.summary.total_unrealized_gains }}</p></div>
+                <div class="summary-item"><h3>Total Combined</h3><p id="total_combined_gains" class="{{ 'positive' if data.summary.total_combined_gains|float >= 0 else 'negative' }}">${{ data.summary.total_combined_gains }}</p></div>
             </div>
             <h2>Detailed Breakdown</h2>
             <table>
                 <thead><tr><th>Ticker</th><th>Holdings</th><th>Avg. Buy Price</th><th>Current Price</th><th>Realized Gains</th><th>Unrealized Gains</th></tr></thead>
                 <tbody id="details-table-body">
                     {% for stock in data.details %}
-                    <tr><td><b>{{ stock.ticker }}</b></td><td>{{ stock.current_holdings }}</td><td>${{ stock.avg_buy_price }}</td><td>${{ stock.current_price }}</td><td class="{{ 'positive' if stock.realized_gains|float >= 0 else 'negative' }}">${{ stock.realized_gains }}</td><td class="{{ 'positive' if stock.unrealized_gains|float >= 0 else 'negative' }}">${{ stock.unrealized_gains }}</td></tr>
+                    <tr data-ticker="{{ stock.ticker }}"><td><b>{{ stock.ticker }}</b></td><td>{{ stock.current_holdings }}</td><td>${{ stock.avg_buy_price }}</td><td>${{ stock.current_price }}</td><td class="{{ 'positive' if stock.realized_gains|float >= 0 else 'negative' }}">${{ stock.realized_gains }}</td><td class="{{ 'positive' if stock.unrealized_gains|float >= 0 else 'negative' }}">${{ stock.unrealized_gains }}</td></tr>
                     {% endfor %}
                 </tbody>
             </table>
+            <h2>P&amp;L Over Time</h2>
+            <div style="position: relative; height: 300px;"><canvas id="pnlChart"></canvas></div>
         </div>
         <script src="https://cdn.socket.io/4.3.2/socket.io.min.js"></script>
+        <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+        <script src="https://cdn.jsdelivr.net/npm/@msgpack/msgpack@2.8.0/dist.es5+umd/msgpack.min.js"></script>
         <script>
+            async function loadPnlHistory() {
+                try {
+                    const res = await fetch('/gains/history'); const data = await res.json(); if (data.error) { console.error(data.error); return; }
+                    new Chart(document.getElementById('pnlChart').getContext('2d'), { type: 'line', data: { labels: data.dates, datasets: [
+                        { label: 'Realized', data: data.total.realized, borderColor: 'rgba(52, 152, 219, 1)', pointRadius: 0 },
+                        { label: 'Unrealized', data: data.total.unrealized, borderColor: 'rgba(243, 156, 18, 1)', pointRadius: 0 },
+                        { label: 'Total', data: data.total.total, borderColor: 'rgba(44, 62, 80, 1)', pointRadius: 0, borderWidth: 3 } ] },
+                        options: { responsive: true, maintainAspectRatio: false, scales: { y: { title: { display: true, text: 'P&L ($)' } } } } });
+                } catch (err) { console.error('Failed to load P&L history:', err); }
+            }
+            loadPnlHistory();
             const socket = io();
-            socket.on('update_gains', function(data) { updateSummary(data.summary); updateDetailsTable(data.details); });
-            function updateSummary(summary) { const container = document.getElementById('summary-container'); const realizedClass = parseFloat(summary.total_realized_gains.replace(/,/g, '')) >= 0 ? 'positive' : 'negative'; const unrealizedClass = parseFloat(summary.total_unrealized_gains.replace(/,/g, '')) >= 0 ? 'positive' : 'negative'; const combinedClass = parseFloat(summary.total_combined_gains.replace(/,/g, '')) >= 0 ? 'positive' : 'negative'; container.innerHTML = `<div class="summary-item"><h3>Realized Gains</h3><p class="${realizedClass}">$${summary.total_realized_gains}</p></div><div class="summary-item"><h3>Unrealized Gains</h3><p class="${unrealizedClass}">$${summary.total_unrealized_gains}</p></div><div class="summary-item"><h3>Total Combined</h3><p class="${combinedClass}">$${summary.total_combined_gains}</p></div>`; }
-            function updateDetailsTable(details) { const tableBody = document.getElementById('details-table-body'); let newHtml = ''; details.forEach(stock => { const realizedClass = parseFloat(stock.realized_gains.replace(/,/g, '')) >= 0 ? 'positive' : 'negative'; const unrealizedClass = parseFloat(stock.unrealized_gains.replace(/,/g, '')) >= 0 ? 'positive' : 'negative'; newHtml += `<tr><td><b>${stock.ticker}</b></td><td>${stock.current_holdings}</td><td>$${stock.avg_buy_price}</td><td>$${stock.current_price}</td><td class="${realizedClass}">$${stock.realized_gains}</td><td class="${unrealizedClass}">$${stock.unrealized_gains}</td></tr>`; }); tableBody.innerHTML = newHtml; }
+            // MessagePack frames when the decoder loaded, JSON otherwise (or when the server can't encode them)
+            const ENCODING = window.MessagePack ? 'msgpack' : 'json';
+            const decodeEvent = data => (data instanceof ArrayBuffer || ArrayBuffer.isView(data)) ? MessagePack.decode(data instanceof ArrayBuffer ? new Uint8Array(data) : data) : data;
+            socket.on('connect', () => socket.emit('subscribe', { portfolio: true, encoding: ENCODING }));
+            socket.on('update_gains', function(raw) { const data = decodeEvent(raw); updateSummary(data.summary || {}); updateDetailsTable(data.details || []); });
+            // Updates only carry the summary fields and rows that changed since the last push
+            function updateSummary(summary) { Object.entries(summary).forEach(([field, value]) => { const p = document.getElementById(field); if (!p) return; p.className = parseFloat(value.replace(/,/g, '')) >= 0 ? 'positive' : 'negative'; p.textContent = '$' + value; }); }
+            function updateDetailsTable(details) {
+                const tableBody = document.getElementById('details-table-body');
+                details.forEach(stock => {
+                    const realizedClass = parseFloat(stock.realized_gains.replace(/,/g, '')) >= 0 ? 'positive' : 'negative'; const unrealizedClass = parseFloat(stock.unrealized_gains.replace(/,/g, '')) >= 0 ? 'positive' : 'negative';
+                    let row = tableBody.querySelector(`tr[data-ticker="${stock.ticker}"]`);
+                    if (!row) { row = document.createElement('tr'); row.dataset.ticker = stock.ticker; tableBody.appendChild(row); }
+                    row.innerHTML = `<td><b>${stock.ticker}</b></td><td>${stock.current_holdings}</td><td>$${stock.avg_buy_price}</td><td>$${stock.current_price}</td><td class="${realizedClass}">$${stock.realized_gains}</td><td class="${unrealizedClass}">$${stock.unrealized_gains}</td>`;
+                });
+            }
         </script>
     </body>
     </html>
@@ -155,11 +290,14 @@ def index():
                 <button onclick="setRange('1h')" id="1hBtn">1 Hour</button>
                 <button onclick="setRange('1d')" id="1dBtn">1 Day</button>
                 <button onclick="setRange('1w')" id="1wBtn">1 Week</button>
+                <button onclick="setRange('1m')" id="1mBtn">1 Month</button>
+                <button onclick="setRange('1y')" id="1yBtn">1 Year</button>
             </div>
         </div>
         <!-- ... The rest of your HTML sections are unchanged ... -->
-        <div class="section"><h2>Your Portfolio</h2><table id="portfolioTable"><thead><tr><th>Ticker</th><th>Quantity</th><th>Buy Price</th><th>Current Price</th></tr></thead><tbody></tbody></table></div>
-        <div class="section"><h2>AI Stock Advisor</h2><form id="aiAdvisorForm" onsubmit="return false;"><input id="tickerInput" placeholder="Enter ticker (e.g., AAPL)" style="text-transform: uppercase;" /><button type="button" id="getAdviceBtn">Get Advice</button></form><div id="adviceResult" style="margin-top: 15px; font-weight: bold;"></div><div id="tradeControls" style="display:none; margin-top:10px;"><label>Quantity: <input type="number" id="qtyInput" min="1" /></label><button type="button" id="executeBtn">Execute Trade</button></div><div id="tradeResult" style="margin-top: 10px; color: green; font-weight: bold;"></div></div>
+        <div class="section"><h2>Your Portfolio</h2><table id="portfolioTable"><thead><tr><th>Ticker</th><th>Quantity</th><th>Avg. Buy Price</th><th>Current Price</th><th>P&amp;L</th></tr></thead><tbody></tbody></table></div>
+        <div class="section"><h2>Watchlist</h2><form id="watchlistForm" onsubmit="return false;"><input id="watchTicker" placeholder="Add ticker (e.g., NVDA)" style="text-transform: uppercase;" /><button type="button" id="addWatchBtn">Watch</button></form><table id="watchlistTable"><thead><tr><th>Ticker</th><th>Price</th><th></th></tr></thead><tbody></tbody></table></div>
+        <div class="section"><h2>AI Stock Advisor</h2><form id="aiAdvisorForm" onsubmit="return false;"><input id="tickerInput" placeholder="Enter ticker (e.g., AAPL)" style="text-transform: uppercase;" /><button type="button" id="getAdviceBtn">Get Advice</button><button type="button" id="portfolioAdviceBtn">Advise Whole Portfolio</button></form><div id="adviceResult" style="margin-top: 15px; font-weight: bold;"></div><ul id="portfolioAdviceList" style="margin-top: 10px;"></ul><div id="tradeControls" style="display:none; margin-top:10px;"><label>Quantity: <input type="number" id="qtyInput" min="1" /></label><button type="button" id="executeBtn">Execute Trade</button></div><div id="tradeResult" style="margin-top: 10px; color: green; font-weight: bold;"></div></div>
         <div class="section"><h2>Manual Trade</h2><form id="tradeForm"><label>Action: <select id="actionSelect"><option value="buy">Buy</option><option value="sell">Sell</option></select></label><label>Ticker: <input type="text" id="tradeTicker" style="text-transform: uppercase;" required /></label><label>Quantity: <input type="number" id="tradeQuantity" min="1" required /></label><button type="submit">Execute Trade</button></form><div id="tradeFeedback"></div></div>
     </div>
 
@@ -167,10 +305,12 @@ def index():
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <script src="https://cdn.jsdelivr.net/npm/moment@2.29.4/moment.min.js"></script>
     <script src="https://cdn.jsdelivr.net/npm/chartjs-adapter-moment@1.0.0/dist/chartjs-adapter-moment.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/@msgpack/msgpack@2.8.0/dist.es5+umd/msgpack.min.js"></script>
     
     <script>
     const ctx = document.getElementById('valueChart').getContext('2d');
-    let liveData = [], fullHistory = [], currentRange = 'live';
+    let liveData = [], currentRange = 'live';
+    let watchlist = JSON.parse(localStorage.getItem('watchlist') || '[]'); const watchPrices = {};
     const chart = new Chart(ctx, {
         type: 'line', data: { datasets: [{ label: 'Portfolio Value', data: [], fill: true, tension: 0, pointRadius: 0, pointHoverRadius: 6, segment: { borderColor: ctx => ctx.p1.parsed.y >= 0 ? 'rgba(0, 200, 0, 1)' : 'rgba(200, 0, 0, 1)', backgroundColor: ctx => ctx.p1.parsed.y >= 0 ? 'rgba(0, 200, 0, 0.2)' : 'rgba(200, 0, 0, 0.2)' } }] },
         options: {
@@ -182,29 +322,65 @@ def index():
         }
     });
 
-    async function loadHistoricalData() {
-        try { const res = await fetch('/history'); const data = await res.json(); fullHistory = data.map(d => ({ x: moment(d.timestamp), y: d.total_worth })); } catch (err) { console.error('Failed to load historical data:', err); }
+    // --- COMPACT ENCODING ---
+    // MessagePack (short keys, raw float64 series) when the decoder loaded; the server falls back to JSON if it can't encode it
+    const ENCODING = window.MessagePack ? 'msgpack' : 'json';
+    const LONG_KEYS = { v: 'value', s: 'ticker', p: 'price', t: 'time' };
+    function decodeEvent(data) {
+        if (!(data instanceof ArrayBuffer || ArrayBuffer.isView(data))) return data;
+        const message = MessagePack.decode(data instanceof ArrayBuffer ? new Uint8Array(data) : data); const event = {};
+        Object.entries(message).forEach(([key, value]) => { event[LONG_KEYS[key] || key] = value; }); return event;
+    }
+    // Series come as a start time plus deltas (seconds) and little-endian float64 columns
+    function decodeSeries(series) {
+        const values = new Float64Array(series.total_worth.slice().buffer); let t = series.t0;
+        return Array.from(values, (value, i) => { if (i > 0) t += series.dt[i - 1]; return { timestamp: t * 1000, total_worth: value }; });
+    }
+    async function fetchHistory(url) {
+        const res = await fetch(url + (url.includes('?') ? '&' : '?') + 'format=' + ENCODING);
+        if (!(res.headers.get('Content-Type') || '').includes('msgpack')) return res.json();
+        const body = MessagePack.decode(new Uint8Array(await res.arrayBuffer()));
+        return body.cursor !== undefined ? { data: decodeSeries(body.data), cursor: body.cursor } : decodeSeries(body);
     }
 
     const socket = io();
-    socket.on('update', function(data) {
-        const now = moment(); document.getElementById('value').innerText = 'Total Portfolio Value: $' + data.value.toFixed(2);
+    socket.on('connect', () => { socket.emit('subscribe', { portfolio: true, encoding: ENCODING }); watchlist.forEach(ticker => socket.emit('subscribe', { ticker, encoding: ENCODING })); });
+    socket.on('update', function(raw) {
+        const data = decodeEvent(raw); const now = moment(); document.getElementById('value').innerText = 'Total Portfolio Value: $' + data.value.toFixed(2);
         liveData.push({x: now, y: data.value}); if(liveData.length > 20) { liveData.shift(); }
         if (currentRange === 'live') { chart.data.datasets[0].data = liveData; chart.update(); }
         updatePortfolioPrices();
     });
 
-    function findClosestDataPoint(targetTime, history, maxDiff) {
-        if (!history || history.length === 0) return null; let closest = null; let minDiff = maxDiff; 
-        for (const point of history) { const diff = Math.abs(targetTime.diff(point.x)); if (diff < minDiff) { minDiff = diff; closest = point; } }
-        return closest;
+    // --- INCREMENTAL HISTORY SYNC ---
+    // The last day of raw samples is cached in localStorage; each sync only fetches samples newer than the cursor
+    const HISTORY_CACHE_KEY = 'portfolioHistory', HISTORY_KEEP_MS = 24 * 60 * 60 * 1000;
+    let rawHistory = [], historyCursor = '';
+    try { const cached = JSON.parse(localStorage.getItem(HISTORY_CACHE_KEY)); if (cached) { rawHistory = cached.data; historyCursor = cached.cursor; } } catch (err) { rawHistory = []; historyCursor = ''; }
+
+    async function syncHistory() {
+        try {
+            const body = await fetchHistory('/history?since=' + encodeURIComponent(historyCursor));
+            if (body.error) { rawHistory = []; historyCursor = ''; return; } // Unknown cursor: start over on the next sync
+            const cutoff = Date.now() - HISTORY_KEEP_MS;
+            rawHistory = rawHistory.concat(body.data).filter(d => moment(d.timestamp).valueOf() > cutoff); historyCursor = body.cursor;
+            try { localStorage.setItem(HISTORY_CACHE_KEY, JSON.stringify({ cursor: historyCursor, data: rawHistory })); } catch (err) { /* storage full or disabled */ }
+        } catch (err) { console.error('Failed to sync historical data:', err); }
+    }
+
+    // Ranges are cut and downsampled on the server (raw samples or 5 min / hourly / daily rollups), at most one point per pixel
+    async function loadRangeData(range) {
+        const maxPoints = Math.max(3, Math.min(5000, Math.round(ctx.canvas.clientWidth || 900)));
+        try { const data = await fetchHistory(`/history?range=${range}&max_points=${maxPoints}`); return data.map(d => ({ x: moment(d.timestamp), y: d.total_worth })); }
+        catch (err) { console.error('Failed to load history for range ' + range + ':', err); return []; }
     }
         // --- Place this corrected function in the main page's <script> block ---
 
     // NEW: Add a variable to track the time of the last 1-hour chart update
     let lastHourChartUpdate = 0;
 
-    socket.on('update', function(data) {
+    socket.on('update', function(raw) {
+        const data = decodeEvent(raw);
         const now = moment();
         const newDataPoint = { x: now, y: data.value };
 
@@ -248,33 +424,49 @@ def index():
         // Always update the portfolio table prices (every 10 seconds)
         updatePortfolioPrices();
     });
-    function setRange(range) {
+    async function setRange(range) {
         currentRange = range; document.querySelectorAll('.time-buttons button').forEach(btn => btn.classList.remove('active')); document.getElementById(range + 'Btn').classList.add('active');
-        let chartData = []; const now = moment();
-        if (range === 'live') { chartData = liveData; chart.options.scales.x.time.unit = 'second'; }
-        else {
-            if (range === '1h') { const startTime = now.clone().subtract(60, 'minutes'); chartData = fullHistory.filter(d => d.x.isAfter(startTime)); chart.options.scales.x.time.unit = 'minute'; }
-            else if (range === '1d') {
-                const startTime = now.clone().subtract(24, 'hours').startOf('hour'); const thirtyMinutes = 30 * 60 * 1000; chartData = [];
-                for (let i = 0; i < 24; i++) { const targetTime = startTime.clone().add(i, 'hours'); const closestPoint = findClosestDataPoint(targetTime, fullHistory, thirtyMinutes); chartData.push({ x: targetTime, y: closestPoint ? closestPoint.y : null }); } // Use null for gaps
-                chart.options.scales.x.time.unit = 'hour';
-            } else if (range === '1w') {
-                const startTime = now.clone().subtract(7, 'days').startOf('day'); const twelveHours = 12 * 60 * 60 * 1000; chartData = [];
-                for (let i = 0; i < 7; i++) { const targetTime = startTime.clone().add(i, 'days'); const closestPoint = findClosestDataPoint(targetTime, fullHistory, twelveHours); chartData.push({ x: targetTime, y: closestPoint ? closestPoint.y : null }); } // Use null for gaps
-                chart.options.scales.x.time.unit = 'day';
-            }
-        }
+        let chartData = [];
+        const units = { live: 'second', '1h': 'minute', '1d': 'hour', '1w': 'day', '1m': 'day', '1y': 'month' };
+        if (range === 'live') { chartData = liveData; }
+        else if (range === '1h') { const startTime = moment().subtract(60, 'minutes'); chartData = rawHistory.map(d => ({ x: moment(d.timestamp), y: d.total_worth })).filter(d => d.x.isAfter(startTime)); }
+        else { chartData = await loadRangeData(range); if (currentRange !== range) return; } // Another range was picked while loading
+        chart.options.scales.x.time.unit = units[range];
         chart.data.labels = []; chart.data.datasets[0].data = chartData; chart.update();
     }
     
+    // One row per ticker (click it to show the individual lots); the server caches the priced positions for a few seconds
+    const expandedTickers = new Set();
+    function toggleLots(ticker) { if (expandedTickers.has(ticker)) expandedTickers.delete(ticker); else expandedTickers.add(ticker); updatePortfolioPrices(); }
     async function updatePortfolioPrices() {
         try {
-            const res = await fetch('/portfolio'); const portfolio = await res.json(); const tbody = document.querySelector('#portfolioTable tbody'); tbody.innerHTML = '';
-            portfolio.forEach(stock => { const tr = document.createElement('tr'); const currentPrice = stock.current_price ? `$${stock.current_price.toFixed(2)}` : "N/A"; tr.innerHTML = `<td><b>${stock.ticker}</b></td><td>${stock.quantity}</td><td>$${stock.price.toFixed(2)}</td><td>${currentPrice}</td>`; tbody.appendChild(tr); });
+            const res = await fetch('/portfolio'); const positions = await res.json(); const tbody = document.querySelector('#portfolioTable tbody'); tbody.innerHTML = '';
+            positions.forEach(position => {
+                const tr = document.createElement('tr'); tr.style.cursor = 'pointer'; tr.onclick = () => toggleLots(position.ticker);
+                const currentPrice = position.current_price != null ? `$${position.current_price.toFixed(2)}` : "N/A"; const pnl = position.pnl != null ? `$${position.pnl.toFixed(2)}` : "N/A";
+                tr.innerHTML = `<td><b>${position.ticker}</b> (${position.lots.length} lot${position.lots.length === 1 ? '' : 's'})</td><td>${position.quantity}</td><td>$${position.avg_price.toFixed(2)}</td><td>${currentPrice}</td><td>${pnl}</td>`; tbody.appendChild(tr);
+                if (expandedTickers.has(position.ticker)) position.lots.forEach(lot => { const lotRow = document.createElement('tr'); lotRow.innerHTML = `<td style="padding-left: 30px;">${lot.timestamp ? moment(lot.timestamp).format('YYYY-MM-DD HH:mm') : ''}</td><td>${lot.quantity}</td><td>$${lot.price.toFixed(2)}</td><td></td><td></td>`; tbody.appendChild(lotRow); });
+            });
         } catch (err) { console.error("Failed to update portfolio prices", err); }
     }
     
     
+    // --- WATCHLIST LOGIC ---
+    // Each watched ticker is a Socket.IO room; the server only prices tickers somebody holds or watches
+    function renderWatchlist() {
+        const tbody = document.querySelector('#watchlistTable tbody'); tbody.innerHTML = '';
+        watchlist.forEach(ticker => { const tr = document.createElement('tr'); const price = watchPrices[ticker] != null ? `$${watchPrices[ticker].toFixed(2)}` : 'Waiting for price...'; tr.innerHTML = `<td><b>${ticker}</b></td><td>${price}</td><td><button type="button" onclick="unwatch('${ticker}')">Remove</button></td>`; tbody.appendChild(tr); });
+    }
+    function saveWatchlist() { localStorage.setItem('watchlist', JSON.stringify(watchlist)); renderWatchlist(); }
+    document.getElementById('addWatchBtn').onclick = () => {
+        const ticker = document.getElementById('watchTicker').value.trim().toUpperCase();
+        if (!ticker || watchlist.includes(ticker)) return;
+        socket.emit('subscribe', { ticker, encoding: ENCODING }, res => { if (res && res.error) { alert(res.error); return; } watchlist.push(ticker); document.getElementById('watchTicker').value = ''; saveWatchlist(); });
+    };
+    function unwatch(ticker) { socket.emit('unsubscribe', { ticker }); watchlist = watchlist.filter(t => t !== ticker); delete watchPrices[ticker]; saveWatchlist(); }
+    socket.on('tick', raw => { const data = decodeEvent(raw); watchPrices[data.ticker] = data.price; renderWatchlist(); });
+    renderWatchlist();
+
     // --- AI ADVISOR LOGIC ---
     const tickerInput = document.getElementById('tickerInput');
     const getAdviceBtn = document.getElementById('getAdviceBtn');
@@ -285,6 +477,56 @@ def index():
     const tradeResult = document.getElementById('tradeResult');
     let currentAdvice = null, currentTicker = null, ownedQuantity = 0;
 
+    // Advice runs as a background job on the server; progress and the result arrive over the socket (polled as a fallback)
+    const ADVICE_STATUS_TEXT = { queued: 'Waiting for a free advisor...', fetching_news: 'Fetching news...', advising: 'Asking the AI advisor...' };
+    let adviceJobId = null, advicePoll = null;
+    function showAdvice(job) {
+        if (job.job_id !== adviceJobId) return; // An older request
+        if (job.status === 'failed') { adviceResult.textContent = "Error: " + job.error; stopAdvicePoll(); return; }
+        if (job.status !== 'done') { adviceResult.textContent = `${job.ticker}: ${ADVICE_STATUS_TEXT[job.status] || job.status}`; return; }
+        stopAdvicePoll();
+        currentAdvice = job.result.advice; currentTicker = job.ticker; ownedQuantity = job.result.owned_quantity;
+        adviceResult.textContent = `AI Advice for ${currentTicker}: ${currentAdvice.toUpperCase()}. You own ${ownedQuantity} shares.`;
+        if (currentAdvice === "buy" || (currentAdvice === "sell" && ownedQuantity > 0)) {
+            tradeControls.style.display = "block";
+            qtyInput.min = 1;
+            qtyInput.max = (currentAdvice === "sell") ? ownedQuantity : null;
+        } else { tradeControls.style.display = "none"; }
+    }
+    function stopAdvicePoll() { if (advicePoll) { clearInterval(advicePoll); advicePoll = null; } }
+    socket.on('advice_progress', showAdvice);
+
+    // Whole-portfolio advice: one job and one model call for all holdings; click a line to trade on it
+    const portfolioAdviceList = document.getElementById('portfolioAdviceList');
+    let portfolioJobId = null, portfolioPoll = null;
+    function selectAdvice(ticker, advice, owned) {
+        currentTicker = ticker; currentAdvice = advice; ownedQuantity = owned; tradeResult.textContent = ""; qtyInput.value = "";
+        adviceResult.textContent = `AI Advice for ${ticker}: ${advice.toUpperCase()}. You own ${owned} shares.`;
+        tradeControls.style.display = (advice === "buy" || (advice === "sell" && owned > 0)) ? "block" : "none";
+        qtyInput.min = 1; qtyInput.max = (advice === "sell") ? owned : null;
+    }
+    function showPortfolioAdvice(job) {
+        if (job.job_id !== portfolioJobId) return;
+        if (job.status === 'failed') { adviceResult.textContent = "Error: " + job.error; clearInterval(portfolioPoll); return; }
+        if (job.status !== 'done') { adviceResult.textContent = `Portfolio: ${ADVICE_STATUS_TEXT[job.status] || job.status}`; return; }
+        clearInterval(portfolioPoll); adviceResult.textContent = "Portfolio advice:"; portfolioAdviceList.innerHTML = '';
+        Object.entries(job.result.advice).forEach(([ticker, advice]) => {
+            const li = document.createElement('li'); li.style.cursor = 'pointer'; li.textContent = `${ticker}: ${advice.toUpperCase()} (you own ${job.result.owned[ticker] || 0})`;
+            li.onclick = () => selectAdvice(ticker, advice, job.result.owned[ticker] || 0); portfolioAdviceList.appendChild(li);
+        });
+    }
+    socket.on('advice_progress', showPortfolioAdvice);
+    document.getElementById('portfolioAdviceBtn').onclick = async () => {
+        adviceResult.textContent = "Loading portfolio advice..."; portfolioAdviceList.innerHTML = ''; tradeControls.style.display = "none"; tradeResult.textContent = "";
+        clearInterval(portfolioPoll);
+        try {
+            const job = await (await fetch('/aistock/advice/portfolio', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({sid: socket.id}) })).json();
+            if (job.error) { adviceResult.textContent = "Error: " + job.error; return; }
+            portfolioJobId = job.job_id; showPortfolioAdvice(job);
+            portfolioPoll = setInterval(async () => { try { showPortfolioAdvice(await (await fetch('/aistock/advice/' + portfolioJobId)).json()); } catch (err) { /* next poll */ } }, 5000);
+        } catch (err) { adviceResult.textContent = "Failed to fetch portfolio advice."; }
+    };
+
     getAdviceBtn.onclick = async () => {
         const ticker = tickerInput.value.trim().toUpperCase();
         if (!ticker) { alert("Please enter a ticker symbol."); return; }
@@ -292,17 +534,13 @@ def index():
         tradeControls.style.display = "none";
         tradeResult.textContent = "";
         qtyInput.value = "";
+        stopAdvicePoll();
         try {
-            const response = await fetch('/aistock/advice', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ticker}) });
-            const data = await response.json();
-            if (data.error) { adviceResult.textContent = "Error: " + data.error; return; }
-            currentAdvice = data.advice; currentTicker = ticker; ownedQuantity = data.owned_quantity;
-            adviceResult.textContent = `AI Advice for ${ticker}: ${currentAdvice.toUpperCase()}. You own ${ownedQuantity} shares.`;
-            if (currentAdvice === "buy" || (currentAdvice === "sell" && ownedQuantity > 0)) {
-                tradeControls.style.display = "block";
-                qtyInput.min = 1;
-                qtyInput.max = (currentAdvice === "sell") ? ownedQuantity : null;
-            } else { tradeControls.style.display = "none"; }
+            const response = await fetch('/aistock/advice', { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ticker, sid: socket.id}) });
+            const job = await response.json();
+            if (job.error) { adviceResult.textContent = "Error: " + job.error; return; }
+            adviceJobId = job.job_id; showAdvice(job);
+            advicePoll = setInterval(async () => { try { showAdvice(await (await fetch('/aistock/advice/' + adviceJobId)).json()); } catch (err) { /* next poll */ } }, 5000);
         } catch (err) { adviceResult.textContent = "Failed to fetch advice."; }
     };
 
@@ -348,31 +586,96 @@ def index():
     });
 
     // --- INITIAL DATA LOAD ---
-    loadHistoricalData().then(() => setRange('live'));
+    syncHistory().then(() => setRange('live'));
+    setInterval(syncHistory, 60000);
     updatePortfolioPrices();
     </script>
 </body>
 </html>
     """)
-def combined_updates():
-    last_10s = time.time()
-    last_60s = time.time()
-    
-    while True:
-        now = time.time()
+def publish(event, payload, room):
+    """Emits an event to a room, encoded once per encoding its members use."""
+    if rooms.has_subscribers(room, JSON): socketio.emit(event, payload, to=room)
+    if rooms.has_subscribers(room, MSGPACK): socketio.emit(event, encode_event(event, payload), to=encoded_room(room, MSGPACK))
+
+def send_to_client(event, payload, encoding):
+    socketio.emit(event, encode_event(event, payload) if encoding == MSGPACK else payload, to=request.sid)
+
+@socketio.on('subscribe')
+def on_subscribe(data):
+    """
+    Joins the portfolio room ({"portfolio": true}) or a ticker room ({"ticker": "AAPL"}).
+    With "encoding": "msgpack" the events come as MessagePack frames (when the server can encode them).
+    """
+    data = data or {}; encoding = negotiate(data.get("encoding"))
+    if data.get("portfolio"):
+        room = encoded_room(PORTFOLIO_ROOM, encoding); rooms.join(request.sid, room); join_room(room)
+        # Updates are only pushed when the value changes, so subscribers get the current one here
+        if mark_to_market.is_priced(): send_to_client('update', {'value': mark_to_market.value}, encoding)
+        return {"ok": True, "encoding": encoding}
+    ticker = str(data.get("ticker", "")).upper()
+    if not TICKER_PATTERN.match(ticker): return {"error": "Invalid ticker"}
+    room = encoded_room(ticker_room(ticker), encoding)
+    if not rooms.join(request.sid, room): return {"error": "Too many subscriptions"}
+    join_room(room)
+    if ticker in last_quotes: send_to_client('tick', {'ticker': ticker, 'price': last_quotes[ticker]}, encoding)
+    return {"ok": True, "encoding": encoding}
+
+@socketio.on('unsubscribe')
+def on_unsubscribe(data):
+    data = data or {}
+    room = PORTFOLIO_ROOM if data.get("portfolio") else ticker_room(str(data.get("ticker", "")).upper())
+    for encoding in (JSON, MSGPACK): rooms.leave(request.sid, encoded_room(room, encoding)); leave_room(encoded_room(room, encoding))
+    return {"ok": True}
+
+@socketio.on('disconnect')
+def on_disconnect():
+    rooms.leave_all(request.sid); advice_jobs.forget_listener(request.sid); portfolio_advice_jobs.forget_listener(request.sid)
+
+def poll_ticks():
+    """
+    Prices every ticker that is held or has subscribers (once each), publishes changed
+    prices to their ticker rooms and feeds them into the mark-to-market state.
+    Returns True if the portfolio total changed.
+    """
+    changed = mark_to_market.reload_if_changed()
+    tickers = sorted(set(mark_to_market.tickers()) | rooms.tickers())
+    try: quotes = get_latest_prices(tickers, max_age=0) if tickers else {}  # One download for all of them
+    except Exception as e: print(f"Error fetching prices for {', '.join(tickers)}: {e}"); return changed
+    for ticker, price in quotes.items():
+        if last_quotes.get(ticker) != price:
+            last_quotes[ticker] = price
+            publish('tick', {'ticker': ticker, 'price': price}, ticker_room(ticker))
+        changed = mark_to_market.on_tick(ticker, price) or changed
+    return changed
+
+def valuation_job():
+    # 10-second job: only push when the portfolio value actually moved
+    if poll_ticks() and mark_to_market.is_priced():
+        publish('update', {'value': mark_to_market.value}, PORTFOLIO_ROOM)
+    # Runs every tick, not only on price changes: a trade changes the aggregates too
+    if mark_to_market.is_priced() and rooms.has_subscribers(PORTFOLIO_ROOM): push_gains()
+
+def record_job():
+    # 60-second job: records the value from the last valuation pass instead of pricing again
+    if not mark_to_market.is_priced():
+        print("Portfolio not priced yet, skipping history sample.")
+        return
+    record_portfolio_worth(mark_to_market.value)
 
-        # 10-second task
-        if now - last_10s >= 10:
-            value = totaltotal()
-            socketio.emit('update', {'value': value})
-            last_10s = now
+@app.route("/scheduler")
+def scheduler_stats():
+    return jsonify(scheduler.stats())
 
+# Background news for held and watched tickers, so advice runs against local articles
+news_watcher = NewsWatcher(fetch_news, lambda: set(mark_to_market.tickers()) | rooms.tickers())
 
+@app.route("/news/watcher")
+def news_watcher_stats():
+    return jsonify(news_watcher.stats())
 
-        time.sleep(1) 
-def sixty_second_updater():
-    while True:
-        record_portfolio_worth()
-        time.sleep(60)
-threading.Thread(target=combined_updates, daemon=True).start()
-socketio.start_background_task(target=sixty_second_updater)
+scheduler = Scheduler()
+scheduler.add_job("valuation", 10, valuation_job, jitter=0.5)
+scheduler.add_job("record", 60, record_job, delay=15)  # First run after the first valuation
+scheduler.add_job("news", 30, news_watcher.run_once, jitter=5, delay=30)  # At most one ticker per run
+scheduler.start()
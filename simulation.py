@@ -3,6 +3,7 @@ import time
 from datetime import datetime, timedelta
 from stockprice import get_stock_price
 import pandas as pd
+from money import to_micros, from_micros
 
 class Simulator:
     def __init__(
@@ -20,7 +21,7 @@ class Simulator:
     ):
         self.ticker = ticker
         self.current_date = start_date
-        self.capital = start_capital
+        self.capital_micros = to_micros(start_capital)  # money micro-units, see money.py
         self.threshold_pct = threshold_pct
         self.take_profit_pct = take_profit_pct
         self.stop_loss_pct = stop_loss_pct
@@ -36,6 +37,14 @@ class Simulator:
         self.last_close_price = None
         self.trades_today = 0
 
+    @property
+    def capital(self):
+        return from_micros(self.capital_micros)
+
+    @capital.setter
+    def capital(self, value):
+        self.capital_micros = to_micros(value)
+
     def start(self):
         if self._thread and self._thread.is_alive():
             print("Simulator already running.")
@@ -73,7 +82,7 @@ class Simulator:
                     if abs(pct_change) >= self.threshold_pct:
                         # Determine trade direction
                         direction = "LONG" if pct_change < 0 else "SHORT"
-                        position_size = self.capital * self.position_size_frac
+                        position_size = round(self.capital_micros * self.position_size_frac)
                         entry_price = price
 
                         if direction == "LONG":
@@ -87,10 +96,10 @@ class Simulator:
                         realized_return_pct = self.take_profit_pct
 
                         # Calculate costs (entry + exit)
-                        costs = position_size * (self.transaction_cost_pct / 100) * 2
+                        costs = round(position_size * (self.transaction_cost_pct / 100) * 2)
 
-                        profit_loss = position_size * (realized_return_pct / 100) - costs
-                        self.capital += profit_loss
+                        profit_loss = round(position_size * (realized_return_pct / 100)) - costs
+                        self.capital_micros += profit_loss
 
                         trade_record = {
                             "Date": self.current_date,
@@ -99,7 +108,7 @@ class Simulator:
                             "Take_Profit_Price": take_profit_price,
                             "Stop_Loss_Price": stop_loss_price,
                             "Return_%": realized_return_pct,
-                            "Costs": costs,
+                            "Costs": from_micros(costs),
                             "Capital_After_Trade": self.capital,
                         }
                         self.trade_log.append(trade_record)
@@ -1,7 +1,14 @@
+import hashlib
 import yfinance as yf
 from datetime import datetime, timedelta
-from threading import Thread
+from threading import Thread, Lock
 from queue import Queue
+import time
+
+QUOTE_MAX_AGE = 15  # seconds a cached live quote is served without asking yfinance again
+
+_quote_cache = {}  # ticker -> (monotonic fetch time, price)
+_quote_lock = Lock()
 
 def get_first_live_price(ticker: str) -> float:
 
@@ -60,3 +67,119 @@ def get_stock_price(ticker: str, date: datetime) -> float:
         raise ValueError(f"No data available for {ticker} on {date.strftime('%Y-%m-%d')}")
 
     return float(data['Close'].iloc[0].iloc[0])
+
+
+def get_daily_closes(ticker: str, start: datetime, end: datetime) -> dict:
+    """
+    Fetches all daily closing prices between start (inclusive) and end (exclusive)
+    in a single request.
+
+    Returns:
+        dict: {date: closing price}, empty if there is no data (e.g. only weekends)
+    """
+    data = yf.Tickers(ticker).download(
+        interval='1d',
+        start=start,
+        end=end,
+        prepost=False,
+        actions=True,
+        auto_adjust=True,
+        repair=False,
+        threads=True,
+        group_by='column',
+        progress=False,
+        timeout=10
+    )
+
+    if data.empty or 'Close' not in data.columns:
+        return {}
+
+    closes = data['Close'].iloc[:, 0].dropna()
+    return {index.date(): float(close) for index, close in closes.items()}
+
+
+def get_latest_prices(tickers, max_age: float = QUOTE_MAX_AGE) -> dict:
+    """
+    Latest live prices for several tickers. Quotes younger than `max_age` seconds
+    come from the cache; the rest are fetched together in a single download.
+
+    Returns:
+        dict: {ticker: price}; tickers without data are left out
+    """
+    now = time.monotonic()
+    prices = {}
+    missing = []
+    with _quote_lock:
+        for ticker in dict.fromkeys(tickers):
+            cached = _quote_cache.get(ticker)
+            if cached is not None and now - cached[0] <= max_age:
+                prices[ticker] = cached[1]
+            else:
+                missing.append(ticker)
+    if not missing:
+        return prices
+
+    data = yf.Tickers(" ".join(missing)).download(
+        period='1d',
+        interval='1m',
+        prepost=True,
+        actions=True,
+        auto_adjust=True,
+        repair=False,
+        threads=True,
+        group_by='column',
+        progress=False,
+        timeout=10
+    )
+    if data.empty or 'Close' not in data.columns:
+        return prices
+
+    closes = data['Close']
+    fetched = {}
+    for ticker in missing:
+        if ticker not in closes.columns:
+            continue
+        column = closes[ticker].dropna()
+        if not column.empty:
+            fetched[ticker] = float(column.iloc[-1])
+
+    with _quote_lock:
+        for ticker, price in fetched.items():
+            _quote_cache[ticker] = (now, price)
+    prices.update(fetched)
+    return prices
+
+
+class YahooQuotes:
+    """Live quotes and company names from yfinance."""
+
+    def price(self, ticker: str) -> float:
+        return get_stock_price(ticker, datetime.now())
+
+    def latest_prices(self, tickers) -> dict:
+        return get_latest_prices(tickers)
+
+    def company_name(self, ticker: str) -> str:
+        """Company name for a ticker (empty if yfinance doesn't know it)."""
+        try:
+            info = yf.Ticker(ticker).info
+            return info.get("shortName") or info.get("longName") or ""
+        except Exception:
+            return ""
+
+
+class StubQuotes:
+    """
+    Made-up but stable quotes that need no network, for offline runs with the
+    stub model backend: every ticker gets a fixed price between 20 and 520.
+    """
+
+    def price(self, ticker: str) -> float:
+        digest = hashlib.sha256(ticker.upper().encode("utf-8")).digest()
+        return round(20 + int.from_bytes(digest[:4], "big") % 50000 / 100, 2)
+
+    def latest_prices(self, tickers) -> dict:
+        return {ticker: self.price(ticker) for ticker in tickers}
+
+    def company_name(self, ticker: str) -> str:
+        return ""
@@ -4,6 +4,7 @@ import json
 import os
 from datetime import datetime
 from stockprice import get_stock_price  # Import your existing function
+from gains_calculator import load_aggregates, apply_trade, save_aggregates
 
 PORTFOLIO_FILE = "portfolio.json"
 TRADE_HISTORY_FILE = "trade_history.json"
@@ -33,6 +34,9 @@ def save_trade_history(history):
         json.dump(history, f, indent=4)
 
 def log_trade(action, ticker, quantity, price):
+    # Load the gains aggregates while they still match the old history
+    aggregates = load_aggregates(history_path=TRADE_HISTORY_FILE)
+
     history = load_trade_history()
     history.append({
         "action": action,
@@ -43,6 +47,10 @@ def log_trade(action, ticker, quantity, price):
     })
     save_trade_history(history)
 
+    # Keep the per-ticker gains aggregates in step with the history
+    apply_trade(aggregates, action, ticker, quantity, price)
+    save_aggregates(aggregates, history_path=TRADE_HISTORY_FILE)
+
 # ---------------------- Actions ----------------------
 
 def buy_stock(ticker, quantity):
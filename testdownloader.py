@@ -0,0 +1,80 @@
+# Runs the downloader against local stub servers: one host answers the first
+# request to each page with 429 + Retry-After, one is slow and one trickles its
+# body a byte at a time. The slow pages must not wait for the rate-limited host,
+# and the trickling page must be given up on at its deadline.
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from downloader import Downloader
+
+RETRY_AFTER = 2
+URL_TIMEOUT = 4
+
+seen = set()
+finished = {}  # path -> when the stub finished sending it
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/limited") and self.path not in seen:
+            seen.add(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", str(RETRY_AFTER))
+            self.end_headers()
+            return
+        if self.path.startswith("/slow"):
+            time.sleep(1)
+        body = f"<html><body>{self.path}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            if self.path.startswith("/trickle"):
+                for byte in body:
+                    self.wfile.write(bytes([byte]))
+                    self.wfile.flush()
+                    time.sleep(0.5)
+            else:
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            return  # The downloader gave up on this page
+        finished[self.path] = time.monotonic()
+
+    def log_message(self, format, *args):
+        pass
+
+
+servers = [ThreadingHTTPServer(("127.0.0.1", 0), StubHandler) for _ in range(3)]
+for server in servers:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+limited_host, slow_host, trickle_host = (f"http://127.0.0.1:{server.server_address[1]}" for server in servers)
+
+limited = [f"{limited_host}/limited/{i}" for i in range(4)]
+slow = [f"{slow_host}/slow/{i}" for i in range(2)]
+trickle = f"{trickle_host}/trickle/0"
+downloader = Downloader(rate=5, burst=2, url_timeout=URL_TIMEOUT, total_timeout=10, max_attempts=1)
+downloader_retrying = Downloader(rate=5, burst=2, url_timeout=URL_TIMEOUT, total_timeout=10)
+
+start = time.monotonic()
+results = downloader_retrying.fetch_all(limited + slow)
+elapsed = time.monotonic() - start
+print(f"Finished in {elapsed:.1f}s")
+for url, response in results.items():
+    print(url, response.status_code if response is not None else "no response")
+    assert response is not None and response.status_code == 200, f"{url} did not come back with 200"
+for url in slow:
+    done = finished["/" + url.split("/", 3)[3]] - start
+    assert done < RETRY_AFTER, f"{url} took {done:.1f}s: it waited for the rate-limited host"
+assert elapsed >= RETRY_AFTER, "the rate-limited pages were retried before their Retry-After"
+
+start = time.monotonic()
+response = downloader.fetch_all([trickle])[trickle]
+elapsed = time.monotonic() - start
+print(f"Trickling page: {'no response' if response is None else response.status_code} after {elapsed:.1f}s")
+assert response is None, "the trickling page should have been given up on"
+assert elapsed < URL_TIMEOUT + 1, f"the trickling page ran {elapsed:.1f}s past its {URL_TIMEOUT}s deadline"
+
+print("OK")
+for server in servers:
+    server.shutdown()
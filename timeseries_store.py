@@ -0,0 +1,163 @@
+import os
+import struct
+import threading
+import numpy as np
+
+# Each segment covers `segment_seconds` of samples and is stored column by
+# column: "<segment start>.time" holds int64 epoch seconds and
+# "<segment start>.<column>" one float64 per sample, all little-endian and
+# fixed width. Appending a sample is a few small writes to the open segment
+# files, and retention just deletes whole segments. Readers memory-map the
+# columns and binary-search the time column, so a range query only touches
+# the pages it returns no matter how much history is kept.
+
+TIME_SUFFIX = "time"
+
+
+class TimeSeriesStore:
+    """Append-only, segmented store of (epoch seconds, float columns) samples."""
+
+    def __init__(self, directory, columns=("value",), segment_seconds=86400, retention_seconds=None):
+        self.directory = directory
+        self.columns = tuple(columns)
+        self.segment_seconds = segment_seconds
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._segment = None
+        self._files = {}
+
+    # ---------------------- Segments ----------------------
+
+    def _segment_start(self, timestamp):
+        return timestamp - timestamp % self.segment_seconds
+
+    def _path(self, segment, suffix):
+        return os.path.join(self.directory, f"{segment}.{suffix}")
+
+    def segments(self):
+        """Sorted start times of the segments on disk."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(name.split(".")[0]) for name in os.listdir(self.directory)
+            if name.endswith("." + TIME_SUFFIX)
+        )
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._segment = None
+
+    def _open_segment(self, segment):
+        self._close_files()
+        os.makedirs(self.directory, exist_ok=True)
+        suffixes = (TIME_SUFFIX,) + self.columns
+        # Every field is 8 bytes wide: cut all columns back to the last complete
+        # sample in case an earlier write was interrupted halfway
+        sizes = [os.path.getsize(self._path(segment, suffix)) if os.path.exists(self._path(segment, suffix)) else 0
+                 for suffix in suffixes]
+        complete = min(sizes) // 8 * 8
+        for suffix, size in zip(suffixes, sizes):
+            f = open(self._path(segment, suffix), "ab")
+            if size != complete:
+                f.truncate(complete)
+            self._files[suffix] = f
+        self._segment = segment
+
+    # ---------------------- Writing ----------------------
+
+    def append(self, timestamp, *values):
+        """Appends one sample (epoch seconds plus one float per column)."""
+        if len(values) != len(self.columns):
+            raise ValueError(f"Expected {len(self.columns)} values, got {len(values)}")
+        timestamp = int(timestamp)
+        segment = self._segment_start(timestamp)
+        with self._lock:
+            if segment != self._segment:
+                self._open_segment(segment)
+                self._prune(timestamp)
+            try:
+                for column, value in zip(self.columns, values):
+                    f = self._files[column]
+                    f.write(struct.pack("<d", value))
+                    f.flush()
+                f = self._files[TIME_SUFFIX]
+                f.write(struct.pack("<q", timestamp))
+                f.flush()
+            except Exception:
+                # Reopening the segment on the next append repairs a partial sample
+                self._close_files()
+                raise
+
+    def _prune(self, now):
+        if self.retention_seconds is None:
+            return
+        cutoff = now - self.retention_seconds
+        for segment in self.segments():
+            if segment + self.segment_seconds > cutoff or segment == self._segment:
+                break
+            for suffix in (TIME_SUFFIX,) + self.columns:
+                try:
+                    os.remove(self._path(segment, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        with self._lock:
+            self._close_files()
+
+    # ---------------------- Reading ----------------------
+
+    def _map_segment(self, segment):
+        """Memory-maps the columns of a segment (read-only, nothing is copied)."""
+        columns = {}
+        for suffix, dtype in [(TIME_SUFFIX, "<i8")] + [(column, "<f8") for column in self.columns]:
+            path = self._path(segment, suffix)
+            count = os.path.getsize(path) // 8 if os.path.exists(path) else 0
+            columns[suffix] = np.memmap(path, dtype=dtype, mode="r", shape=(count,)) if count else np.empty(0, dtype=dtype)
+        # A sample that is still being written can leave columns of different lengths
+        count = min(len(data) for data in columns.values())
+        return {suffix: data[:count] for suffix, data in columns.items()}
+
+    def read(self, start=None, end=None):
+        """
+        Returns the samples with start <= time < end as a dict of numpy arrays:
+        "time" (int64 epoch seconds) plus one float64 array per column.
+        """
+        parts = {suffix: [] for suffix in (TIME_SUFFIX,) + self.columns}
+        for segment in self.segments():
+            if end is not None and segment >= end:
+                break
+            if start is not None and segment + self.segment_seconds <= start:
+                continue
+            data = self._map_segment(segment)
+            times = data[TIME_SUFFIX]
+            lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+            hi = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+            for suffix in parts:
+                parts[suffix].append(np.array(data[suffix][lo:hi]))
+
+        result = {}
+        for suffix, dtype in [(TIME_SUFFIX, np.int64)] + [(column, np.float64) for column in self.columns]:
+            result[suffix] = np.concatenate(parts[suffix]) if parts[suffix] else np.empty(0, dtype=dtype)
+        return result
+
+    def first_time(self):
+        """Epoch seconds of the oldest sample, or None if the store is empty."""
+        for segment in self.segments():
+            times = self._map_segment(segment)[TIME_SUFFIX]
+            if len(times):
+                return int(times[0])
+        return None
+
+    def last_time(self):
+        """Epoch seconds of the newest sample, or None if the store is empty."""
+        for segment in reversed(self.segments()):
+            times = self._map_segment(segment)[TIME_SUFFIX]
+            if len(times):
+                return int(times[-1])
+        return None
+
+    def is_empty(self):
+        return not self.segments()